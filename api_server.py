@@ -5,29 +5,202 @@ Btrfs Snapshot Manager REST API Server
 """
 
 import os
-import sys
-import json
+import gzip
+import hashlib
+import shutil
+import stat
+import subprocess
 import threading
 import time
+from collections import deque
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Deque, Dict, Any
 
-from flask import Flask, request, jsonify, Response
+from flask import Flask, g, request, Response, send_file
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
+from werkzeug.exceptions import BadRequest, HTTPException
+from werkzeug.security import safe_join
 import logging
+import orjson
+import psutil
 
-# Add current directory to path for imports
-sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
 
-from snapshot_manager import SnapshotManager
+from snapshot_manager import SnapshotManager, SnapshotBatcher
 from config_loader import ConfigLoader
 from fs_watcher import FileSystemWatcher
 
 
+# 文件时间戳的ISO格式（精确到秒），避免逐项构造datetime对象
+MTIME_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+
+@lru_cache(maxsize=4096)
+def _format_mtime_seconds(seconds: int) -> str:
+    return time.strftime(MTIME_FORMAT, time.localtime(seconds))
+
+
+def _format_mtime(mtime: float) -> str:
+    """将st_mtime格式化为本地时间的ISO字符串；批量写入的文件常共享同一秒，按整秒缓存格式化结果"""
+    return _format_mtime_seconds(int(mtime))
+
+
+def _json(payload: Any, status: int = 200) -> Response:
+    """使用orjson序列化响应，替代jsonify的纯Python编码；bytes视为已序列化的响应体"""
+    if not isinstance(payload, bytes):
+        payload = orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS)
+    return Response(payload, status=status, mimetype='application/json')
+
+
+def _gzip(body: bytes) -> bytes:
+    """gzip压缩响应体；不按响应体缓存结果，否则大的快照列表和日志会常驻内存，每次未命中还要对整个响应体求哈希"""
+    return gzip.compress(body, compresslevel=5)
+
+
+def _to_msgpack(body: bytes) -> bytes:
+    """把已序列化的JSON响应体转码为MessagePack"""
+    return msgpack.packb(orjson.loads(body))
+
+
+def _etag(body: bytes) -> str:
+    return hashlib.blake2b(body, digest_size=8).hexdigest()
+
+
+def _conditional_json(body: bytes, etag: str, max_age: Optional[int] = None) -> Response:
+    """带ETag的JSON响应，客户端If-None-Match命中时返回304空响应；max_age允许客户端短时间内直接复用"""
+    response = Response(body, mimetype='application/json')
+    # JSON和MessagePack是同一数据的不同表示，ETag须区分，否则304会让msgpack客户端沿用缓存的JSON
+    response.set_etag(f'{etag}-msgpack' if _wants_msgpack() else etag, weak=True)
+    if max_age is not None:
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+    return response.make_conditional(request)
+
+
+class ORJSONProvider(JSONProvider):
+    """Flask JSON提供者，jsonify和request.get_json()均走orjson"""
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s, **kwargs: Any) -> Any:
+        return orjson.loads(s)
+
+
+MSGPACK_MIMETYPE = 'application/msgpack'
+
+
+def _wants_msgpack() -> bool:
+    """安装了msgpack且客户端的Accept更偏好application/msgpack时为True"""
+    return msgpack is not None and request.accept_mimetypes.best_match(
+        ('application/json', MSGPACK_MIMETYPE)) == MSGPACK_MIMETYPE
+
+
+def _request_payload(silent: bool = False) -> Any:
+    """解析请求体：安装了msgpack且Content-Type为application/msgpack时按MessagePack解码，否则按JSON解析"""
+    if msgpack is not None and request.mimetype == MSGPACK_MIMETYPE:
+        try:
+            return msgpack.unpackb(request.get_data())
+        except Exception:
+            if silent:
+                return None
+            raise BadRequest('Failed to decode MessagePack body')
+    return request.get_json(silent=silent)
+
+
+# 固定内容的响应体，导入时序列化一次
+NOT_FOUND_BODY = orjson.dumps({'error': 'API endpoint not found'})
+INTERNAL_ERROR_BODY = orjson.dumps({'error': 'Internal server error'})
+NO_CONFIG_DATA_BODY = orjson.dumps({'error': 'No configuration data provided'})
+SNAPSHOT_NOT_FOUND_BODY = orjson.dumps({'error': 'Snapshot not found'})
+FILE_NOT_FOUND_BODY = orjson.dumps({'error': 'File not found'})
+WATCH_DIR_NOT_FOUND_BODY = orjson.dumps({'error': 'Watch directory not found'})
+WATCH_DIR_MISSING_BODY = orjson.dumps({'error': 'Watch directory does not exist'})
+CREATE_FAILED_BODY = orjson.dumps({'success': False, 'message': 'Failed to create snapshot'})
+DELETE_FAILED_BODY = orjson.dumps({'success': False, 'message': 'Failed to delete snapshot'})
+MONITORING_ACTIVE_BODY = orjson.dumps({'success': False, 'message': 'Monitoring is already active'})
+MONITORING_INACTIVE_BODY = orjson.dumps({'success': False, 'message': 'Monitoring is not active'})
+MONITORING_STARTED_BODY = orjson.dumps({'success': True, 'message': 'File monitoring started'})
+MONITORING_STOPPED_BODY = orjson.dumps({'success': True, 'message': 'File monitoring stopped'})
+UNSUPPORTED_BATCH_PATH_BODY = orjson.dumps({'error': 'Unsupported batch path'})
+NON_JSON_BATCH_PATH_BODY = orjson.dumps({'error': 'Endpoint does not return JSON'})
+
+# /api/logs中请求记录的图标和描述，按(路由端点, 方法)查找
+REQUEST_LOG_LABELS = {
+    ('create_snapshot', 'POST'): ('📸', '创建快照请求'),
+    ('restore_snapshot', 'POST'): ('🔄', '恢复快照请求'),
+    ('delete_snapshot', 'DELETE'): ('🗑️', '删除快照请求'),
+    ('start_monitoring', 'POST'): ('▶️', '启动监控请求'),
+    ('stop_monitoring', 'POST'): ('⏸️', '停止监控请求'),
+    ('handle_config', 'POST'): ('⚙️', '配置修改请求'),
+    ('get_logs', 'GET'): ('📋', '日志查看请求'),
+}
+
+# 快照操作日志行的图标，按顺序匹配第一个出现的关键字
+OPERATION_LOG_ICONS = (('created', '✅'), ('deleted', '🗑️'), ('restored', '🔄'))
+
+# 读取日志尾部时每次向前读取的字节数
+TAIL_BLOCK_SIZE = 8192
+
+# 请求记录中User-Agent的最大保留长度，避免客户端发送的超长请求头常驻内存
+USER_AGENT_MAX_LEN = 256
+
+# 快照增删后需要失效的缓存项
+SNAPSHOT_CACHE_KEYS = ('snapshots', 'snapshots_info', 'snapshots_bundle', 'stats')
+
+# /api/health只有时间戳会变，其余部分预先序列化
+HEALTH_PREFIX = b'{"status":"healthy","timestamp":"'
+HEALTH_SUFFIX = b'","version":"1.0.0"}'
+
+
+def _snapshot_dict(snapshot) -> Dict[str, Any]:
+    """把list_snapshots_with_stat返回的元组转换为接口中的快照信息"""
+    name, path, mtime, size = snapshot
+    return {
+        'name': name,
+        'path': path,
+        'created_time': _format_mtime(mtime),
+        'size': size
+    }
+
+
+def _stream_json_list(field: str, items, trailer, batch_size: int = 256):
+    """分块输出{field: [...], **trailer()}，逐条编码列表元素；trailer在列表输出完毕后求值"""
+    yield b'{"' + field.encode() + b'":['
+    chunk = []
+    for index, item in enumerate(items):
+        if index:
+            chunk.append(b',')
+        chunk.append(orjson.dumps(item, option=orjson.OPT_NON_STR_KEYS))
+        if len(chunk) >= batch_size:
+            yield b''.join(chunk)
+            chunk = []
+    if chunk:
+        yield b''.join(chunk)
+    yield b'],' + orjson.dumps(trailer(), option=orjson.OPT_NON_STR_KEYS)[1:]
+
+
 class SnapshotAPI:
+    # 轮询类GET接口的响应缓存时间（秒）
+    CACHE_TTL = 2.0
+    # 列表超过该长度时改为流式输出，避免整块缓冲；流式输出始终为JSON，不做MessagePack协商
+    STREAM_THRESHOLD = 1000
+    # 后台采样磁盘/CPU/内存信息的间隔（秒）
+    STATS_INTERVAL = 2.0
+    # /api/stats响应体的缓存时间（秒）
+    STATS_CACHE_TTL = 1.5
+    # 超过该大小（字节）的JSON响应在客户端支持时gzip压缩
+    COMPRESS_MIN_SIZE = 1024
+
     def __init__(self, config_path: Optional[str] = None):
         self.app = Flask(__name__)
+        self.app.json = ORJSONProvider(self.app)
         CORS(self.app)  # 允许跨域请求
 
         # 加载配置
@@ -44,16 +217,51 @@ class SnapshotAPI:
             test_mode=self.config.get('test_mode', False)
         )
 
+        # 预先序列化GET /api/config的响应并构造目录路径，仅在配置修改时重建
+        self._refresh_config_payload()
+
         # 文件监控器状态
         self.watcher: Optional[FileSystemWatcher] = None
+        self.batcher: Optional[SnapshotBatcher] = None
         self.monitoring_active = False
 
-        # 请求跟踪记录
-        self.recent_requests = []
+        # 服务启动时间（单调时钟），run()中重新记录
+        self.start_time = time.monotonic()
+
+        # 请求跟踪记录（只保留最近的50个请求，超出时自动丢弃最旧的记录）
+        self.recent_requests: Deque[Dict[str, Any]] = deque(maxlen=50)
+
+        # GET接口响应缓存: key -> (过期时间, 序列化后的JSON)
+        self._cache: Dict[str, Any] = {}
+        self._cache_lock = threading.Lock()
+
+        # 快照操作日志尾部缓存: ((mtime_ns, size, count), lines)
+        self._oplog_tail = (None, [])
+
+        # /api/files子目录项数缓存: path -> (目录mtime_ns, 子项数)
+        self._child_counts: Dict[str, Any] = {}
+
+        # /api/files目录索引: 子项名 -> 子项信息；监控开启时按文件事件增量更新，
+        # None表示需要完整扫描一次
+        self._file_index: Optional[Dict[str, Dict[str, Any]]] = None
+        self._file_index_enabled = False
+        self._file_index_dirty: set = set()
+        self._file_index_lock = threading.Lock()
+
+        # 系统统计采样结果，由后台线程在首次请求时启动并定期刷新
+        self._system_stats: Optional[Dict[str, Any]] = None
+        self._stats_thread: Optional[threading.Thread] = None
+        self._stats_lock = threading.Lock()
+        self._stats_stop = threading.Event()
+        # cpu_percent()首次调用只建立基准并返回0.0，启动时先调用一次，使首个采样有意义
+        psutil.cpu_percent(interval=None)
 
         # 设置请求跟踪装饰器
         self.setup_request_tracking()
 
+        # 设置响应编码（MessagePack协商和gzip压缩）
+        self.setup_response_encoding()
+
         # 设置路由
         self.setup_routes()
 
@@ -61,80 +269,345 @@ class SnapshotAPI:
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
 
+    def _refresh_config_payload(self):
+        """根据当前配置重建/api/config的响应体和各接口使用的目录路径"""
+        self._watch_dir = Path(self.config['watch_dir'])
+        self._snapshot_dir = Path(self.config['snapshot_dir'])
+
+        self._config_payload = orjson.dumps({
+            'watch_dir': self.config['watch_dir'],
+            'snapshot_dir': self.config['snapshot_dir'],
+            'max_snapshots': self.config.get('max_snapshots', 50),
+            'cleanup_mode': self.config.get('cleanup_mode', 'count'),
+            'retention_days': self.config.get('retention_days', 7),
+            'cooldown_seconds': self.config.get('cooldown_seconds', 60),
+            'test_mode': self.config.get('test_mode', False)
+        })
+        self._config_etag = _etag(self._config_payload)
+
+    def _memoize(self, key: str, ttl: float, producer) -> Any:
+        """在TTL内复用producer的结果，与响应缓存共用失效机制"""
+        now = time.monotonic()
+        with self._cache_lock:
+            entry = self._cache.get(key)
+        if entry and entry[0] > now:
+            return entry[1]
+
+        value = producer()
+        with self._cache_lock:
+            self._cache[key] = (now + ttl, value)
+        return value
+
+    def _cached(self, key: str, ttl: float, producer) -> Response:
+        """在TTL内复用已序列化的响应，过期后调用producer重新生成"""
+        now = time.monotonic()
+        with self._cache_lock:
+            entry = self._cache.get(key)
+        if entry and entry[0] > now:
+            body, etag = entry[1]
+        else:
+            payload = producer()
+            if isinstance(payload, Response):
+                # 流式响应不进入缓存
+                return payload
+            body = orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS)
+            etag = _etag(body)
+            with self._cache_lock:
+                self._cache[key] = (now + ttl, (body, etag))
+        return _conditional_json(body, etag)
+
+    def _invalidate_cache(self, *keys: str):
+        """快照或文件变化后使缓存失效，不指定key时清空全部"""
+        with self._cache_lock:
+            if not keys:
+                self._cache.clear()
+            for key in keys:
+                self._cache.pop(key, None)
+
+    def _snapshot_info(self, snapshots: Optional[list] = None) -> Dict[str, Any]:
+        """快照统计信息；真实Btrfs下需为每个快照调用btrfs filesystem du，因此在TTL内共享结果。
+        调用方已扫描过快照目录时可传入snapshots，避免重复扫描"""
+        return self._memoize('snapshots_info', self.CACHE_TTL,
+                             lambda: self.manager.get_snapshot_info(snapshots))
+
+    def _batch_entry(self, path: str) -> bytes:
+        """在进程内分派单个GET路径，返回可直接拼接的JSON字节。
+        文件下载等直通或非JSON响应不能原样拼接；流式JSON列表由get_data()合并。
+        单个路径出错也不影响批量中的其他路径"""
+        with self.app.test_request_context(path, method='GET'):
+            try:
+                response = self.app.make_response(self.app.dispatch_request())
+            except HTTPException:
+                return NOT_FOUND_BODY
+            except Exception:
+                self.logger.exception(f"批量请求中的路径 {path} 处理失败")
+                return INTERNAL_ERROR_BODY
+
+            try:
+                if response.direct_passthrough or response.mimetype != 'application/json':
+                    return NON_JSON_BATCH_PATH_BODY
+                return response.get_data()
+            finally:
+                # send_file的响应持有打开的文件
+                response.close()
+
+    def _internal_error(self, message: str) -> Response:
+        """记录异常堆栈并返回预先序列化的500响应，不把内部错误信息暴露给客户端"""
+        self.logger.exception(message)
+        return _json(INTERNAL_ERROR_BODY, 500)
+
+    def _monitoring_status(self) -> Dict[str, Any]:
+        return {
+            'active': self.monitoring_active,
+            'watch_dir': self.config['watch_dir'],
+            # 读取监控器设置的状态标志，不查询observer线程
+            'watcher_alive': self.watcher.running if self.watcher else False
+        }
+
+    def _sample_system_stats(self) -> Dict[str, Any]:
+        """采集磁盘使用情况和系统负载"""
+        # 磁盘使用情况，计算方式与shutil.disk_usage一致
+        vfs = os.statvfs(self.config['snapshot_dir'])
+        total = vfs.f_blocks * vfs.f_frsize
+        used = (vfs.f_blocks - vfs.f_bfree) * vfs.f_frsize
+        free = vfs.f_bavail * vfs.f_frsize
+
+        return {
+            'disk': {
+                'total': total,
+                'used': used,
+                'free': free,
+                'percent': (used / total) * 100
+            },
+            'system': {
+                'cpu_percent': psutil.cpu_percent(),
+                'memory_percent': psutil.virtual_memory().percent,
+                'load_avg': os.getloadavg() if hasattr(os, 'getloadavg') else None
+            }
+        }
+
+    def _stats_sampler_loop(self):
+        """后台定期刷新系统统计，采样失败时保留上一次结果"""
+        while not self._stats_stop.wait(self.STATS_INTERVAL):
+            try:
+                self._system_stats = self._sample_system_stats()
+            except Exception as e:
+                self.logger.error(f"Failed to sample system stats: {e}")
+
+    def _get_system_stats(self) -> Dict[str, Any]:
+        """返回最近一次采样结果；采样线程在首次调用时启动（在gunicorn worker进程内）"""
+        if self._stats_thread is None:
+            with self._stats_lock:
+                if self._stats_thread is None:
+                    self._system_stats = self._sample_system_stats()
+                    self._stats_thread = threading.Thread(target=self._stats_sampler_loop, daemon=True)
+                    self._stats_thread.start()
+        return self._system_stats
+
+    def _tail_operation_log(self, log_file: Path, count: int = 10) -> list:
+        """读取操作日志最后count行，文件未变化时直接返回缓存结果"""
+        try:
+            st = log_file.stat()
+        except OSError:
+            return []
+
+        key = (st.st_mtime_ns, st.st_size, count)
+        cached_key, cached_lines = self._oplog_tail
+        if cached_key == key:
+            return cached_lines
+
+        try:
+            with open(log_file, 'rb') as f:
+                # 从文件末尾按块向前读取，直到凑够count行，不把整个日志读入内存
+                pos = f.seek(0, os.SEEK_END)
+                data = b''
+                while pos > 0 and data.count(b'\n') <= count:
+                    step = min(TAIL_BLOCK_SIZE, pos)
+                    pos -= step
+                    f.seek(pos)
+                    data = f.read(step) + data
+        except OSError:
+            return []
+
+        lines = data.decode('utf-8', errors='replace').splitlines()[-count:]
+
+        self._oplog_tail = (key, lines)
+        return lines
+
+    def _describe_file(self, name: str, path: str, st: os.stat_result,
+                       child_counts: Dict[str, Any]) -> Dict[str, Any]:
+        """构造/api/files中单个子项的信息，目录的子项数写入child_counts"""
+        is_directory = stat.S_ISDIR(st.st_mode)
+        item_info = {
+            'name': name,
+            'path': name,
+            'full_path': path,
+            'is_directory': is_directory,
+            'size': st.st_size if not is_directory else 0,
+            'modified_time': _format_mtime(st.st_mtime)
+        }
+
+        if is_directory:
+            # 如果是目录，计算子项数量；目录mtime未变时子项数不变，复用上次结果
+            cached = self._child_counts.get(path)
+            if cached and cached[0] == st.st_mtime_ns:
+                count = cached[1]
+            else:
+                try:
+                    with os.scandir(path) as sub:
+                        count = sum(1 for _ in sub)
+                except OSError:
+                    count = None
+
+            if count is not None:
+                child_counts[path] = (st.st_mtime_ns, count)
+            item_info['item_count'] = count or 0
+
+        return item_info
+
+    def _scan_files(self):
+        """扫描监控目录的直接子项，逐个产出(名称, 子项信息)；跳过无权限访问的项"""
+        child_counts = {}
+        with os.scandir(self.config['watch_dir']) as it:
+            for entry in it:
+                try:
+                    # DirEntry自带类型和stat缓存，避免重复系统调用
+                    st = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                yield entry.name, self._describe_file(entry.name, entry.path, st, child_counts)
+
+        # 只保留本次仍存在的目录，避免缓存无限增长
+        self._child_counts = child_counts
+
+    def _on_watch_event(self, path: str):
+        """文件事件回调（监控线程）：标记受影响的顶层子项，下次请求时只重新stat这些项"""
+        name = os.path.relpath(path, self.config['watch_dir']).split(os.sep, 1)[0]
+        if name in ('.', '..'):
+            return
+        with self._file_index_lock:
+            self._file_index_dirty.add(name)
+        self._invalidate_cache('files')
+
+    def _reset_file_index(self, enabled: bool):
+        """开启/关闭目录索引，或在目录被整体替换后丢弃索引"""
+        with self._file_index_lock:
+            self._file_index_enabled = enabled
+            self._file_index = None
+            self._file_index_dirty = set()
+        self._invalidate_cache('files')
+
+    def _indexed_files(self) -> Optional[list]:
+        """返回索引中的子项列表并应用积累的变化；未开启监控时返回None"""
+        with self._file_index_lock:
+            if not self._file_index_enabled:
+                return None
+
+            if self._file_index is None:
+                self._file_index_dirty = set()
+                self._file_index = dict(self._scan_files())
+            elif self._file_index_dirty:
+                watch_dir = self.config['watch_dir']
+                for name in self._file_index_dirty:
+                    path = os.path.join(watch_dir, name)
+                    try:
+                        st = os.lstat(path)
+                    except OSError:
+                        self._file_index.pop(name, None)
+                        continue
+                    self._file_index[name] = self._describe_file(name, path, st, self._child_counts)
+                self._file_index_dirty = set()
+
+            return list(self._file_index.values())
+
     def setup_request_tracking(self):
         """设置请求跟踪"""
         @self.app.before_request
         def track_request():
             """跟踪每个请求"""
-            from flask import request
-            import time
-
             # 只跟踪API请求
             if request.path.startswith('/api/'):
+                # 只读一次时钟；时分秒取自按秒缓存的格式化结果
+                now = time.time()
+                # 直接读取WSGI environ，不经过headers包装对象；记录中只保存字符串和数字，
+                # 不引用request对象本身
+                environ = request.environ
                 request_info = {
-                    'time': time.strftime('%H:%M:%S'),
-                    'method': request.method,
+                    'time': _format_mtime(now)[11:],
+                    'method': environ['REQUEST_METHOD'],
                     'path': request.path,
-                    'ip': request.remote_addr,
-                    'user_agent': request.headers.get('User-Agent', ''),
-                    'timestamp': time.time()
+                    'endpoint': request.endpoint,
+                    'ip': environ.get('REMOTE_ADDR', ''),
+                    'user_agent': environ.get('HTTP_USER_AGENT', '')[:USER_AGENT_MAX_LEN],
+                    'timestamp': now
                 }
 
-                # 将请求信息添加到列表中（保留最近的50个请求）
+                # 将请求信息添加到记录中，deque按maxlen自动丢弃最旧的请求
                 self.recent_requests.append(request_info)
-                if len(self.recent_requests) > 50:
-                    self.recent_requests.pop(0)
+                # 记录本请求对应的条目，响应时直接更新，无需回查
+                g.request_record = request_info
 
         @self.app.after_request
         def track_response(response):
             """跟踪响应状态"""
-            from flask import request
-            import time
-
-            # 更新最后一个请求的状态码
-            if request.path.startswith('/api/') and self.recent_requests:
-                for req in reversed(self.recent_requests):
-                    if (req['method'] == request.method and
-                        req['path'] == request.path and
-                        req['ip'] == request.remote_addr and
-                        'status' not in req):
-                        req['status'] = response.status_code
-                        break
+            # 更新本请求记录的状态码
+            record = g.get('request_record')
+            if record is not None:
+                record['status'] = response.status_code
 
             return response
 
+    def setup_response_encoding(self):
+        """按Accept协商MessagePack编码，并对较大的响应启用gzip压缩。
+        超过STREAM_THRESHOLD的流式列表响应不经过这里，始终以未压缩的JSON返回，
+        即使客户端只接受application/msgpack"""
+        @self.app.after_request
+        def encode_response(response):
+            if (response.status_code == 304 or response.is_streamed or response.direct_passthrough
+                    or response.mimetype != 'application/json'):
+                return response
+
+            body = response.get_data()
+
+            if msgpack is not None:
+                response.vary.add('Accept')
+                if _wants_msgpack():
+                    body = _to_msgpack(body)
+                    response.set_data(body)
+                    response.mimetype = MSGPACK_MIMETYPE
+
+            if (response.status_code != 200 or len(body) < self.COMPRESS_MIN_SIZE
+                    or 'Content-Encoding' in response.headers
+                    or 'gzip' not in request.accept_encodings):
+                return response
+
+            response.set_data(_gzip(body))
+            response.headers['Content-Encoding'] = 'gzip'
+            response.vary.add('Accept-Encoding')
+            return response
+
     def setup_routes(self):
         """设置API路由"""
 
         @self.app.route('/api/health', methods=['GET'])
         def health_check():
             """健康检查"""
-            return jsonify({
-                'status': 'healthy',
-                'timestamp': datetime.now().isoformat(),
-                'version': '1.0.0'
-            })
+            return _json(b''.join((
+                HEALTH_PREFIX, datetime.now().isoformat().encode(), HEALTH_SUFFIX
+            )))
 
         @self.app.route('/api/config', methods=['GET', 'POST'])
         def handle_config():
             """获取或保存配置"""
             if request.method == 'GET':
                 """获取当前配置"""
-                return jsonify({
-                    'watch_dir': self.config['watch_dir'],
-                    'snapshot_dir': self.config['snapshot_dir'],
-                    'max_snapshots': self.config.get('max_snapshots', 50),
-                    'cleanup_mode': self.config.get('cleanup_mode', 'count'),
-                    'retention_days': self.config.get('retention_days', 7),
-                    'cooldown_seconds': self.config.get('cooldown_seconds', 60),
-                    'test_mode': self.config.get('test_mode', False)
-                })
+                return _conditional_json(self._config_payload, self._config_etag, max_age=1)
             elif request.method == 'POST':
                 """保存配置"""
                 try:
-                    data = request.get_json()
+                    data = _request_payload()
                     if not data:
-                        return jsonify({'error': 'No configuration data provided'}), 400
+                        return _json(NO_CONFIG_DATA_BODY, 400)
 
                     # 更新配置对象
                     self.config.update({
@@ -148,191 +621,229 @@ class SnapshotAPI:
                         'test_mode': bool(data.get('test_mode', self.config.get('test_mode', False)))
                     })
 
+                    self._refresh_config_payload()
+                    self._invalidate_cache()
+
                     # 这里可以添加保存到文件的逻辑
                     # 由于是Docker环境，暂时只在内存中更新
                     self.logger.info(f"Configuration updated: {data}")
 
-                    return jsonify({
+                    return _json({
                         'success': True,
                         'message': 'Configuration updated successfully',
                         'config': self.config
                     })
 
-                except Exception as e:
-                    self.logger.error(f"Failed to update configuration: {e}")
-                    return jsonify({'error': str(e)}), 500
+                except Exception:
+                    return self._internal_error("Failed to update configuration")
 
         @self.app.route('/api/snapshots', methods=['GET'])
         def list_snapshots():
             """列出所有快照"""
-            try:
-                snapshots = self.manager.list_snapshots()
-                snapshot_list = []
-
-                for snapshot in snapshots:
-                    stat = snapshot.stat()
-                    snapshot_list.append({
-                        'name': snapshot.name,
-                        'path': str(snapshot),
-                        'created_time': datetime.fromtimestamp(stat.st_mtime).isoformat(),
-                        'size': stat.st_size
-                    })
+            def build():
+                # 快照已按名称中的创建时间排好序（名称无时间戳时按mtime），stat结果来自scandir缓存
+                entries = self.manager.list_snapshots_with_stat()
 
-                return jsonify({
+                if len(entries) > self.STREAM_THRESHOLD:
+                    return Response(
+                        _stream_json_list('snapshots', map(_snapshot_dict, entries), lambda: {'count': len(entries)}),
+                        mimetype='application/json'
+                    )
+
+                snapshot_list = [_snapshot_dict(entry) for entry in entries]
+
+                return {
                     'snapshots': snapshot_list,
                     'count': len(snapshot_list)
-                })
+                }
 
-            except Exception as e:
-                return jsonify({'error': str(e)}), 500
+            try:
+                return self._cached('snapshots', self.CACHE_TTL, build)
+
+            except Exception:
+                return self._internal_error("列出快照时发生异常")
 
         @self.app.route('/api/snapshots', methods=['POST'])
         def create_snapshot():
             """创建快照"""
             try:
-                data = request.get_json() or {}
+                data = _request_payload() or {}
                 event_info = data.get('description', 'Manual snapshot via API')
                 client_ip = request.remote_addr
                 self.logger.info(f"用户 {client_ip} 请求创建快照，描述: {event_info}")
 
-                success = self.manager.create_snapshot(event_info)
+                # 成功时直接返回新快照路径，无需重新扫描快照目录
+                snapshot_path = self.manager.create_snapshot(event_info)
 
-                if success:
-                    # 获取最新快照信息
-                    snapshots = self.manager.list_snapshots()
-                    latest = snapshots[-1] if snapshots else None
-                    self.logger.info(f"用户 {client_ip} 成功创建快照: {latest.name if latest else 'Unknown'}")
+                if snapshot_path:
+                    self._invalidate_cache(*SNAPSHOT_CACHE_KEYS)
+                    self.logger.info(f"用户 {client_ip} 成功创建快照: {snapshot_path.name}")
 
-                    return jsonify({
+                    return _json({
                         'success': True,
                         'message': 'Snapshot created successfully',
                         'snapshot': {
-                            'name': latest.name if latest else None,
-                            'path': str(latest) if latest else None,
-                            'created_time': datetime.now().isoformat()
+                            'name': snapshot_path.name,
+                            'path': str(snapshot_path),
+                            'created_time': self.manager.last_snapshot_time.isoformat()
                         }
                     })
                 else:
                     self.logger.error(f"用户 {client_ip} 快照创建失败")
-                    return jsonify({
-                        'success': False,
-                        'message': 'Failed to create snapshot'
-                    }), 400
+                    return _json(CREATE_FAILED_BODY, 400)
 
-            except Exception as e:
-                self.logger.error(f"创建快照时发生异常: {str(e)}")
-                return jsonify({'error': str(e)}), 500
+            except Exception:
+                return self._internal_error("创建快照时发生异常")
 
         @self.app.route('/api/snapshots/<snapshot_name>', methods=['DELETE'])
         def delete_snapshot(snapshot_name):
             """删除指定快照"""
             try:
-                snapshot_path = Path(self.config['snapshot_dir']) / snapshot_name
+                snapshot_path = self._snapshot_dir / snapshot_name
 
                 if not snapshot_path.exists():
-                    return jsonify({'error': 'Snapshot not found'}), 404
+                    return _json(SNAPSHOT_NOT_FOUND_BODY, 404)
 
                 success = self.manager._delete_snapshot(snapshot_path)
+                self._invalidate_cache(*SNAPSHOT_CACHE_KEYS)
 
                 if success:
-                    return jsonify({
+                    return _json({
                         'success': True,
                         'message': f'Snapshot {snapshot_name} deleted successfully'
                     })
                 else:
-                    return jsonify({
-                        'success': False,
-                        'message': 'Failed to delete snapshot'
-                    }), 400
+                    return _json(DELETE_FAILED_BODY, 400)
 
-            except Exception as e:
-                return jsonify({'error': str(e)}), 500
+            except Exception:
+                return self._internal_error("删除快照时发生异常")
 
         @self.app.route('/api/snapshots/<snapshot_name>/restore', methods=['POST'])
         def restore_snapshot(snapshot_name):
             """恢复指定快照"""
             try:
-                snapshot_path = Path(self.config['snapshot_dir']) / snapshot_name
-                watch_path = Path(self.config['watch_dir'])
+                snapshot_path = self._snapshot_dir / snapshot_name
+                watch_path = self._watch_dir
 
                 if not snapshot_path.exists():
-                    return jsonify({'error': 'Snapshot not found'}), 404
+                    return _json(SNAPSHOT_NOT_FOUND_BODY, 404)
 
                 if not watch_path.exists():
-                    return jsonify({'error': 'Watch directory not found'}), 404
+                    return _json(WATCH_DIR_NOT_FOUND_BODY, 404)
 
                 # 备份当前目录
-                import shutil
-                from datetime import datetime
-                backup_name = f"projects_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+                now = datetime.now()
+                backup_name = f"projects_backup_{now.strftime('%Y%m%d_%H%M%S')}"
                 backup_path = watch_path.parent / backup_name
 
                 # 执行恢复
-                import subprocess
-                import os
-
                 # 1. 备份当前目录
                 if watch_path.exists():
                     shutil.move(str(watch_path), str(backup_path))
+                    self._reset_file_index(self.monitoring_active)
 
-                # 2. 从快照创建新的子卷
-                result = subprocess.run([
-                    'btrfs', 'subvolume', 'snapshot', str(snapshot_path), str(watch_path)
-                ], capture_output=True, text=True, timeout=30)
-
-                if result.returncode == 0:
+                # 2. 从快照创建新的子卷；超时或btrfs命令不可用同样视为失败，以便还原备份
+                try:
+                    result = subprocess.run([
+                        'btrfs', 'subvolume', 'snapshot', str(snapshot_path), str(watch_path)
+                    ], capture_output=True, text=True, timeout=30)
+                    returncode, stderr = result.returncode, result.stderr
+                except (subprocess.TimeoutExpired, OSError) as e:
+                    returncode, stderr = None, str(e)
+
+                if returncode == 0:
                     self.logger.info(f"Snapshot {snapshot_name} restored successfully")
                     self.logger.info(f"Original directory backed up to: {backup_path}")
 
-                    return jsonify({
+                    return _json({
                         'success': True,
                         'message': f'Snapshot {snapshot_name} restored successfully',
                         'backup_path': str(backup_path),
-                        'restored_at': datetime.now().isoformat()
+                        'restored_at': now.isoformat()
                     })
                 else:
-                    # 恢复失败，尝试恢复备份
-                    if backup_path.exists():
+                    self.logger.error(f"Failed to restore snapshot {snapshot_name}: {stderr}")
+                    # 恢复失败，尝试恢复备份；目标已存在时不能移动，否则备份会被移入其中
+                    if backup_path.exists() and not watch_path.exists():
                         shutil.move(str(backup_path), str(watch_path))
-                    return jsonify({'error': f'Restore failed: {result.stderr}'}), 500
+                    return _json({'error': f'Restore failed: {stderr}'}, 500)
 
-            except Exception as e:
-                return jsonify({'error': str(e)}), 500
+            except Exception:
+                return self._internal_error("恢复快照时发生异常")
+
+        @self.app.route('/api/snapshots/<snapshot_name>/files/<path:file_path>', methods=['GET'])
+        def download_snapshot_file(snapshot_name, file_path):
+            """下载快照中的文件；由send_file交给WSGI服务器的file_wrapper零拷贝发送，并支持条件请求"""
+            try:
+                # safe_join拒绝..和绝对路径，防止越出快照目录
+                snapshot_root = safe_join(str(self._snapshot_dir), snapshot_name)
+                path = safe_join(snapshot_root, file_path) if snapshot_root else None
+                if path is None:
+                    return _json(FILE_NOT_FOUND_BODY, 404)
+
+                # 快照复制自可写的监控目录，其中的符号链接可能指向主机上任意文件；
+                # 解析后必须仍在该快照内
+                root = os.path.realpath(snapshot_root)
+                path = os.path.realpath(path)
+                if os.path.commonpath([path, root]) != root or not os.path.isfile(path):
+                    return _json(FILE_NOT_FOUND_BODY, 404)
+
+                return send_file(path, as_attachment=True, conditional=True, etag=True)
+
+            except Exception:
+                return self._internal_error("下载快照文件时发生异常")
 
         @self.app.route('/api/snapshots/cleanup', methods=['POST'])
         def cleanup_snapshots():
             """清理旧快照"""
             try:
                 deleted = self.manager.cleanup_old_snapshots()
+                if deleted:
+                    self._invalidate_cache(*SNAPSHOT_CACHE_KEYS)
 
-                return jsonify({
+                return _json({
                     'success': True,
                     'message': f'Cleaned up {len(deleted)} old snapshots',
                     'deleted_snapshots': deleted,
                     'count': len(deleted)
                 })
 
-            except Exception as e:
-                return jsonify({'error': str(e)}), 500
+            except Exception:
+                return self._internal_error("清理快照时发生异常")
 
         @self.app.route('/api/snapshots/info', methods=['GET'])
         def get_snapshot_info():
             """获取快照统计信息"""
             try:
-                info = self.manager.get_snapshot_info()
-                return jsonify(info)
+                body = orjson.dumps(self._snapshot_info())
+                return _conditional_json(body, _etag(body))
+
+            except Exception:
+                return self._internal_error("获取快照信息时发生异常")
+
+        @self.app.route('/api/snapshots/bundle', methods=['GET'])
+        def get_snapshot_bundle():
+            """一次返回快照列表、统计信息和监控状态，列表和统计共用一次目录扫描"""
+            def build():
+                entries = self.manager.list_snapshots_with_stat()
+                return {
+                    'snapshots': [_snapshot_dict(entry) for entry in entries],
+                    'count': len(entries),
+                    'info': self._snapshot_info([Path(path) for _, path, _, _ in entries]),
+                    'monitoring': self._monitoring_status()
+                }
 
-            except Exception as e:
-                return jsonify({'error': str(e)}), 500
+            try:
+                return self._cached('snapshots_bundle', self.CACHE_TTL, build)
+
+            except Exception:
+                return self._internal_error("获取快照汇总时发生异常")
 
         @self.app.route('/api/monitoring', methods=['GET'])
         def get_monitoring_status():
             """获取监控状态"""
-            return jsonify({
-                'active': self.monitoring_active,
-                'watch_dir': self.config['watch_dir'],
-                'watcher_alive': self.watcher.is_alive() if self.watcher else False
-            })
+            body = orjson.dumps(self._monitoring_status())
+            return _conditional_json(body, _etag(body), max_age=1)
 
         @self.app.route('/api/monitoring/start', methods=['POST'])
         def start_monitoring():
@@ -343,35 +854,40 @@ class SnapshotAPI:
 
                 if self.monitoring_active:
                     self.logger.warning(f"用户 {client_ip} 尝试启动已运行的监控")
-                    return jsonify({
-                        'success': False,
-                        'message': 'Monitoring is already active'
-                    }), 400
+                    return _json(MONITORING_ACTIVE_BODY, 400)
+
+                # 快照在独立线程中创建，执行期间到达的变化合并为一次快照
+                self.batcher = SnapshotBatcher(
+                    self.manager,
+                    on_snapshot=lambda: self._invalidate_cache(*SNAPSHOT_CACHE_KEYS),
+                    cleanup_rate_per_min=self.config.get('cleanup_rate_per_min', 0),
+                    low_priority=self.config.get('low_priority_maintenance', False)
+                )
 
                 def on_file_change(event_type, file_path):
                     self.logger.info(f"检测到文件变化: {event_type} - {file_path}")
-                    success = self.manager.create_snapshot(f"{event_type}: {file_path}")
-                    if success:
-                        self.manager.cleanup_old_snapshots()
+                    self.batcher.submit(f"{event_type}: {file_path}")
 
                 self.watcher = FileSystemWatcher(
                     watch_dir=self.config['watch_dir'],
                     callback=on_file_change,
-                    debounce_seconds=self.config.get('debounce_seconds', 5)
+                    debounce_seconds=self.config.get('debounce_seconds', 5),
+                    on_event=self._on_watch_event
                 )
 
+                # 监控目录无效或inotify达到上限时在此失败，不会留下运行中的批处理线程；
+                # 批处理线程启动前提交的请求会在队列中等待
                 self.watcher.start()
+                self.batcher.start()
+                self._reset_file_index(True)
                 self.monitoring_active = True
+                self._invalidate_cache('stats', 'snapshots_bundle')
                 self.logger.info(f"用户 {client_ip} 成功启动文件监控")
 
-                return jsonify({
-                    'success': True,
-                    'message': 'File monitoring started'
-                })
+                return _json(MONITORING_STARTED_BODY)
 
-            except Exception as e:
-                self.logger.error(f"启动监控时发生异常: {str(e)}")
-                return jsonify({'error': str(e)}), 500
+            except Exception:
+                return self._internal_error("启动监控时发生异常")
 
         @self.app.route('/api/monitoring/stop', methods=['POST'])
         def stop_monitoring():
@@ -382,121 +898,84 @@ class SnapshotAPI:
 
                 if not self.monitoring_active:
                     self.logger.warning(f"用户 {client_ip} 尝试停止未运行的监控")
-                    return jsonify({
-                        'success': False,
-                        'message': 'Monitoring is not active'
-                    }), 400
+                    return _json(MONITORING_INACTIVE_BODY, 400)
 
                 if self.watcher:
                     self.watcher.stop()
+                if self.batcher:
+                    self.batcher.stop()
 
+                self._reset_file_index(False)
                 self.monitoring_active = False
+                self._invalidate_cache('stats', 'snapshots_bundle')
                 self.logger.info(f"用户 {client_ip} 成功停止文件监控")
 
-                return jsonify({
-                    'success': True,
-                    'message': 'File monitoring stopped'
-                })
+                return _json(MONITORING_STOPPED_BODY)
 
-            except Exception as e:
-                self.logger.error(f"停止监控时发生异常: {str(e)}")
-                return jsonify({'error': str(e)}), 500
+            except Exception:
+                return self._internal_error("停止监控时发生异常")
 
         @self.app.route('/api/files', methods=['GET'])
         def list_files():
             """列出监控目录中的文件和目录"""
             try:
-                watch_path = Path(self.config['watch_dir'])
+                def build():
+                    # 只列出直接子项，不递归；监控开启时直接使用事件维护的索引
+                    items = self._indexed_files()
+                    if items is None:
+                        items = [item_info for _, item_info in self._scan_files()]
+
+                    summary = {
+                        'count': len(items),
+                        'watch_dir': self.config['watch_dir'],
+                        'has_files': any(not item['is_directory'] for item in items),
+                        'has_directories': any(item['is_directory'] for item in items)
+                    }
 
-                if not watch_path.exists():
-                    return jsonify({'error': 'Watch directory does not exist'}), 404
+                    if len(items) > self.STREAM_THRESHOLD:
+                        return Response(
+                            _stream_json_list('files', items, lambda: summary),
+                            mimetype='application/json'
+                        )
 
-                items = []
-                # 只列出直接子项，不递归
-                for item in watch_path.iterdir():
-                    try:
-                        stat = item.stat()
-                        is_directory = item.is_dir()
-
-                        item_info = {
-                            'name': item.name,
-                            'path': item.name,
-                            'full_path': str(item),
-                            'is_directory': is_directory,
-                            'size': stat.st_size if not is_directory else 0,
-                            'modified_time': datetime.fromtimestamp(stat.st_mtime).isoformat()
-                        }
+                    return {'files': items, **summary}
 
-                        if is_directory:
-                            # 如果是目录，计算子项数量
-                            try:
-                                sub_items = list(item.iterdir())
-                                item_info['item_count'] = len(sub_items)
-                            except:
-                                item_info['item_count'] = 0
-
-                        items.append(item_info)
-                    except (PermissionError, OSError):
-                        # 跳过无权限访问的项
-                        continue
+                return self._cached('files', self.CACHE_TTL, build)
 
-                return jsonify({
-                    'files': items,
-                    'count': len(items),
-                    'watch_dir': str(watch_path),
-                    'has_files': any(not item.get('is_directory', False) for item in items),
-                    'has_directories': any(item.get('is_directory', False) for item in items)
-                })
-
-            except Exception as e:
-                return jsonify({'error': str(e)}), 500
+            except FileNotFoundError:
+                # 目录不存在时os.scandir直接抛出，无需事先exists()检查
+                return _json(WATCH_DIR_MISSING_BODY, 404)
+            except Exception:
+                return self._internal_error("列出文件时发生异常")
 
         @self.app.route('/api/stats', methods=['GET'])
         def get_stats():
             """获取系统统计信息"""
-            try:
-                import shutil
-                import psutil
-
-                # 磁盘使用情况
-                disk_usage = shutil.disk_usage(self.config['snapshot_dir'])
-
-                # 系统信息
-                stats = {
-                    'disk': {
-                        'total': disk_usage.total,
-                        'used': disk_usage.used,
-                        'free': disk_usage.free,
-                        'percent': (disk_usage.used / disk_usage.total) * 100
-                    },
-                    'system': {
-                        'cpu_percent': psutil.cpu_percent(),
-                        'memory_percent': psutil.virtual_memory().percent,
-                        'load_avg': os.getloadavg() if hasattr(os, 'getloadavg') else None
-                    },
-                    'snapshots': self.manager.get_snapshot_info(),
+            def build():
+                # 磁盘和系统信息由后台线程定期采样
+                return {
+                    **self._get_system_stats(),
+                    'snapshots': self._snapshot_info(),
                     'monitoring': {
                         'active': self.monitoring_active,
-                        'uptime': time.time() - getattr(self, 'start_time', time.time())
+                        'uptime': time.monotonic() - self.start_time
                     }
                 }
 
-                return jsonify(stats)
+            try:
+                # 采样本身就有STATS_INTERVAL的滞后，整个响应体按更短的TTL缓存
+                return self._cached('stats', self.STATS_CACHE_TTL, build)
 
-            except Exception as e:
-                return jsonify({'error': str(e)}), 500
+            except Exception:
+                return self._internal_error("获取系统统计时发生异常")
 
         @self.app.route('/api/logs', methods=['GET'])
         def get_logs():
             """获取系统日志 - 显示实时API服务日志"""
-            import time
-            import re
-            from datetime import datetime, timedelta
-            from pathlib import Path
-            import glob
-
             try:
+                # 每个请求只格式化一次时间，后续各条日志复用
                 current_time = time.strftime('%Y-%m-%d %H:%M:%S')
+                clock = current_time[11:]
                 logs = []
 
                 # 系统状态信息
@@ -508,38 +987,22 @@ class SnapshotAPI:
 
                     # 获取最近的API访问记录（从应用自身的日志记录）
                     # 这里我们直接记录当前API实例的访问情况
-                    recent_requests = getattr(self, 'recent_requests', [])
+                    # 先复制一份，避免其他线程追加记录时遍历deque出错
+                    recent_requests = list(self.recent_requests)
 
                     # 添加最近的请求记录
                     for req in recent_requests[-10:]:
-                        req_time = req.get('time', current_time.split(' ')[1])
+                        req_time = req.get('time', clock)
                         method = req.get('method', 'GET')
                         path = req.get('path', '/')
                         status = req.get('status', 200)
                         ip = req.get('ip', 'unknown')
 
-                        # 根据路径和状态添加图标和描述
-                        if '/api/snapshots' in path and method == 'POST':
-                            icon = "📸"
-                            desc = f"创建快照请求 ({status}) from {ip}"
-                        elif '/api/snapshots/' in path and 'restore' in path and method == 'POST':
-                            icon = "🔄"
-                            desc = f"恢复快照请求 ({status}) from {ip}"
-                        elif '/api/snapshots/' in path and method == 'DELETE':
-                            icon = "🗑️"
-                            desc = f"删除快照请求 ({status}) from {ip}"
-                        elif '/api/monitoring/start' in path and method == 'POST':
-                            icon = "▶️"
-                            desc = f"启动监控请求 ({status}) from {ip}"
-                        elif '/api/monitoring/stop' in path and method == 'POST':
-                            icon = "⏸️"
-                            desc = f"停止监控请求 ({status}) from {ip}"
-                        elif '/api/config' in path and method == 'POST':
-                            icon = "⚙️"
-                            desc = f"配置修改请求 ({status}) from {ip}"
-                        elif '/api/logs' in path:
-                            icon = "📋"
-                            desc = f"日志查看请求 ({status}) from {ip}"
+                        # 根据路由端点和方法查表得到图标和描述
+                        label = REQUEST_LOG_LABELS.get((req.get('endpoint'), method))
+                        if label:
+                            icon = label[0]
+                            desc = f"{label[1]} ({status}) from {ip}"
                         else:
                             icon = "🌐"
                             desc = f"{method} {path} ({status})"
@@ -548,99 +1011,149 @@ class SnapshotAPI:
 
                     # 获取快照相关操作记录
                     snapshot_log_file = Path('/app/logs/snapshot_operations.log')
-                    if snapshot_log_file.exists():
-                        try:
-                            with open(snapshot_log_file, 'r', encoding='utf-8') as f:
-                                snapshot_lines = f.readlines()[-10:]  # 最近10行
-                                for line in snapshot_lines:
-                                    line = line.strip()
-                                    if line:
-                                        if 'created' in line.lower():
-                                            processed_logs.append(f"[{current_time.split(' ')[1]}] ✅ {line}")
-                                        elif 'deleted' in line.lower():
-                                            processed_logs.append(f"[{current_time.split(' ')[1]}] 🗑️ {line}")
-                                        elif 'restored' in line.lower():
-                                            processed_logs.append(f"[{current_time.split(' ')[1]}] 🔄 {line}")
-                        except:
-                            pass
+                    for line in self._tail_operation_log(snapshot_log_file):  # 最近10行
+                        line = line.strip()
+                        if line:
+                            lowered = line.lower()
+                            for keyword, icon in OPERATION_LOG_ICONS:
+                                if keyword in lowered:
+                                    processed_logs.append(f"[{clock}] {icon} {line}")
+                                    break
 
                     # 添加处理后的日志（最近的15条）
                     logs.extend(processed_logs[-15:])
 
                     # 获取当前系统状态信息
                     try:
-                        # 快照统计信息
-                        snapshot_dir = Path('/vol1/1000/snapshots')
-                        if snapshot_dir.exists():
-                            snapshots = [item for item in snapshot_dir.iterdir() if item.is_dir() and item.name not in ['.', '..']]
-                            logs.append(f"[{current_time.split(' ')[1]}] 📸 当前快照总数: {len(snapshots)}")
+                        # 快照统计信息，与/api/stats共享TTL缓存，不再逐个stat快照目录
+                        info = self._snapshot_info()
+                        logs.append(f"[{clock}] 📸 当前快照总数: {info['count']}")
 
-                            # 显示最新的快照
-                            if snapshots:
-                                latest_snapshot = max(snapshots, key=lambda x: x.stat().st_mtime)
-                                logs.append(f"[{current_time.split(' ')[1]}] 🆕 最新快照: {latest_snapshot.name}")
+                        # 显示最新的快照
+                        if info['newest']:
+                            logs.append(f"[{clock}] 🆕 最新快照: {info['newest']}")
 
                         # 监控状态
-                        if hasattr(self, 'watcher') and self.watcher and self.watcher.is_alive():
-                            logs.append(f"[{current_time.split(' ')[1]}] 👀 监控服务运行中")
+                        if self.watcher and self.watcher.running:
+                            logs.append(f"[{clock}] 👀 监控服务运行中")
                         else:
-                            logs.append(f"[{current_time.split(' ')[1]}] ⏸️ 监控服务已停止")
+                            logs.append(f"[{clock}] ⏸️ 监控服务已停止")
 
                     except Exception as e:
-                        logs.append(f"[{current_time.split(' ')[1]}] ⚠️ 获取系统状态时出错: {str(e)}")
+                        logs.append(f"[{clock}] ⚠️ 获取系统状态时出错: {str(e)}")
 
                     # 如果日志不够，添加一些默认信息
                     if len(logs) < 5:
-                        logs.append(f"[{current_time.split(' ')[1]}] 💡 系统运行正常，等待用户操作...")
+                        logs.append(f"[{clock}] 💡 系统运行正常，等待用户操作...")
 
                 except Exception as e:
                     logs.append(f"[{current_time}] ⚠️ 获取实时日志时出错: {str(e)}")
 
                 # 添加最后更新时间
-                logs.append(f"[{current_time.split(' ')[1]}] 🕐 日志更新时间")
+                logs.append(f"[{clock}] 🕐 日志更新时间")
 
-                return jsonify({
+                return _json({
                     'logs': logs[-20:],  # 返回最近20条日志
                     'count': len(logs[-20:]),
                     'source': 'realtime',
                     'timestamp': current_time
                 })
 
-            except Exception as e:
+            except Exception:
+                self.logger.exception("获取实时日志时发生异常")
                 error_time = time.strftime('%Y-%m-%d %H:%M:%S')
                 fallback_logs = [
                     f"[{error_time}] ❌ 无法获取实时日志",
                     f"[{error_time}] 🔧 请检查API服务状态",
                     f"[{error_time}] 📞 联系系统管理员"
                 ]
-                return jsonify({
+                return _json({
                     'logs': fallback_logs,
                     'count': len(fallback_logs),
                     'source': 'error',
                     'timestamp': error_time
                 })
 
+        @self.app.route('/api/batch', methods=['POST'])
+        def batch():
+            """批量获取多个GET接口的结果，减少前端每轮轮询的请求数"""
+            paths = _request_payload(silent=True)
+            if not isinstance(paths, list) or not all(isinstance(path, str) for path in paths):
+                return _json({'error': 'Expected a JSON list of API paths'}, 400)
+
+            parts = []
+            for path in dict.fromkeys(paths):
+                if not path.startswith('/api/') or path.startswith('/api/batch'):
+                    body = UNSUPPORTED_BATCH_PATH_BODY
+                else:
+                    body = self._batch_entry(path)
+                parts.append(orjson.dumps(path) + b':' + body)
+
+            return Response(b'{' + b','.join(parts) + b'}', mimetype='application/json')
+
         @self.app.errorhandler(404)
         def not_found(error):
-            return jsonify({'error': 'API endpoint not found'}), 404
+            return _json(NOT_FOUND_BODY, 404)
 
         @self.app.errorhandler(500)
         def internal_error(error):
-            return jsonify({'error': 'Internal server error'}), 500
+            return _json(INTERNAL_ERROR_BODY, 500)
 
-    def run(self, host='127.0.0.1', port=5000, debug=False):
+    def run(self, host='127.0.0.1', port=5000, debug=False, threads=8):
         """启动API服务器"""
-        self.start_time = time.time()
+        self.start_time = time.monotonic()
         self.logger.info(f"Starting Btrfs Snapshot Manager API on {host}:{port}")
         self.logger.info(f"Watch directory: {self.config['watch_dir']}")
         self.logger.info(f"Snapshot directory: {self.config['snapshot_dir']}")
 
         try:
-            self.app.run(host=host, port=port, debug=debug)
+            if debug:
+                self.app.run(host=host, port=port, debug=debug)
+            else:
+                self._run_gunicorn(host, port, threads)
         finally:
             # 清理资源
+            self._stats_stop.set()
             if self.watcher and self.monitoring_active:
                 self.watcher.stop()
+                self.batcher.stop()
+
+    def _run_gunicorn(self, host: str, port: int, threads: int):
+        """使用gunicorn的gthread worker运行，未安装时依次退回waitress和Flask开发服务器"""
+        try:
+            from gunicorn.app.base import BaseApplication
+        except ImportError:
+            self._run_waitress(host, port, threads)
+            return
+
+        app = self.app
+
+        class GunicornServer(BaseApplication):
+            def load_config(self):
+                self.cfg.set('bind', f'{host}:{port}')
+                # 监控器、请求记录和缓存都保存在进程内存中，只能使用单个worker，
+                # 并发由worker内的线程池提供
+                self.cfg.set('workers', 1)
+                self.cfg.set('worker_class', 'gthread')
+                self.cfg.set('threads', threads)
+                self.cfg.set('timeout', 60)
+
+            def load(self):
+                return app
+
+        GunicornServer().run()
+
+    def _run_waitress(self, host: str, port: int, threads: int):
+        """gunicorn不可用时（如Windows）使用waitress线程池运行"""
+        try:
+            from waitress import serve
+        except ImportError:
+            self.logger.warning("gunicorn/waitress not available, falling back to Flask development server")
+            self.app.run(host=host, port=port, threaded=True)
+            return
+
+        # 降低输出缓冲溢出到临时文件的阈值（默认1MB），大响应较多时可明显减少内存占用
+        serve(self.app, host=host, port=port, threads=threads, outbuf_overflow=16384)
 
 
 def main():
@@ -651,11 +1164,12 @@ def main():
     parser.add_argument('--host', default='127.0.0.1', help='Host to bind to')
     parser.add_argument('--port', type=int, default=5000, help='Port to bind to')
     parser.add_argument('--debug', action='store_true', help='Enable debug mode')
+    parser.add_argument('--threads', type=int, default=8, help='Number of request handling threads')
 
     args = parser.parse_args()
 
     api = SnapshotAPI(config_path=args.config)
-    api.run(host=args.host, port=args.port, debug=args.debug)
+    api.run(host=args.host, port=args.port, debug=args.debug, threads=args.threads)
 
 
 if __name__ == '__main__':
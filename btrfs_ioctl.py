@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+
+import os
+import ctypes
+import fcntl
+from pathlib import Path
+from typing import Union
+
+# Values from linux/btrfs.h; both argument structs are 4096 bytes
+BTRFS_IOCTL_MAGIC = 0x94
+BTRFS_PATH_NAME_MAX = 4087
+BTRFS_SUBVOL_NAME_MAX = 4039
+
+
+def _iow(nr: int, size: int) -> int:
+    return (1 << 30) | (size << 16) | (BTRFS_IOCTL_MAGIC << 8) | nr
+
+
+class VolArgs(ctypes.Structure):
+    _fields_ = [
+        ('fd', ctypes.c_int64),
+        ('name', ctypes.c_char * (BTRFS_PATH_NAME_MAX + 1)),
+    ]
+
+
+class VolArgsV2(ctypes.Structure):
+    _fields_ = [
+        ('fd', ctypes.c_int64),
+        ('transid', ctypes.c_uint64),
+        ('flags', ctypes.c_uint64),
+        ('unused', ctypes.c_uint64 * 4),
+        ('name', ctypes.c_char * (BTRFS_SUBVOL_NAME_MAX + 1)),
+    ]
+
+
+BTRFS_IOC_SNAP_DESTROY = _iow(15, ctypes.sizeof(VolArgs))
+BTRFS_IOC_SNAP_CREATE_V2 = _iow(23, ctypes.sizeof(VolArgsV2))
+
+
+def _open_dir(path: Union[str, Path]) -> int:
+    return os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+
+
+# Same kernel operations as 'btrfs subvolume snapshot/delete', without
+# spawning the btrfs binary. Failures raise OSError with the ioctl's errno.
+def create_snapshot(source: Path, dest: Path):
+    args = VolArgsV2()
+    args.name = os.fsencode(dest.name)
+
+    source_fd = _open_dir(source)
+    try:
+        parent_fd = _open_dir(dest.parent)
+        try:
+            args.fd = source_fd
+            fcntl.ioctl(parent_fd, BTRFS_IOC_SNAP_CREATE_V2, args)
+        finally:
+            os.close(parent_fd)
+    finally:
+        os.close(source_fd)
+
+
+def delete_subvolume(path: Union[str, Path]):
+    parent, name = os.path.split(os.fspath(path))
+    args = VolArgs()
+    args.name = os.fsencode(name)
+
+    parent_fd = _open_dir(parent or '.')
+    try:
+        fcntl.ioctl(parent_fd, BTRFS_IOC_SNAP_DESTROY, args)
+    finally:
+        os.close(parent_fd)
@@ -1,10 +1,12 @@
 #!/usr/bin/env python3
 
 import os
+import re
 import sys
 import signal
 import argparse
-import time
+import subprocess
+import threading
 import logging
 from pathlib import Path
 from datetime import datetime
@@ -12,7 +14,7 @@ from typing import Optional
 
 from config_loader import ConfigLoader
 from fs_watcher import FileSystemWatcher
-from snapshot_manager import SnapshotManager
+from snapshot_manager import SnapshotManager, SnapshotBatcher
 from logger_util import setup_logging
 
 
@@ -20,6 +22,7 @@ class BtrfsSnapshotService:
     def __init__(self, config_path: Optional[str] = None, test_mode: bool = False):
         self.test_mode = test_mode
         self.running = False
+        self._stopped = threading.Event()
         self.logger = logging.getLogger(__name__)
 
         self.config = ConfigLoader(config_path).load()
@@ -35,6 +38,11 @@ class BtrfsSnapshotService:
             cooldown_seconds=self.config.get('cooldown_seconds', 60),
             test_mode=test_mode
         )
+        self.batcher = SnapshotBatcher(
+            self.snapshot_manager,
+            cleanup_rate_per_min=self.config.get('cleanup_rate_per_min', 0),
+            low_priority=self.config.get('low_priority_maintenance', False)
+        )
 
         self.watcher = FileSystemWatcher(
             watch_dir=self.config['watch_dir'],
@@ -50,22 +58,38 @@ class BtrfsSnapshotService:
             self.logger.error("This script must be run as root for Btrfs operations")
             sys.exit(1)
 
+        # One stat serves both the existence and the subvolume check
         watch_dir = Path(self.config['watch_dir'])
-        if not watch_dir.exists():
+        try:
+            watch_stat = os.stat(watch_dir)
+        except FileNotFoundError:
             self.logger.error(f"Watch directory does not exist: {watch_dir}")
             sys.exit(1)
+        except OSError as e:
+            self.logger.error(f"Cannot access watch directory {watch_dir}: {e}")
+            sys.exit(1)
 
-        if not self.test_mode and not self.is_btrfs_subvolume(watch_dir):
+        if not self.test_mode and not self.is_btrfs_subvolume(watch_dir, watch_stat):
             self.logger.error(f"Watch directory is not a Btrfs subvolume: {watch_dir}")
             sys.exit(1)
 
-        snapshot_dir = Path(self.config['snapshot_dir'])
-        if not snapshot_dir.exists():
-            self.logger.info(f"Creating snapshot directory: {snapshot_dir}")
-            snapshot_dir.mkdir(parents=True, exist_ok=True)
+        # mkdir fails fast with FileExistsError in the common case, no separate exists() check
+        snapshot_dir = self.config['snapshot_dir']
+        try:
+            os.makedirs(snapshot_dir)
+            self.logger.info(f"Created snapshot directory: {snapshot_dir}")
+        except FileExistsError:
+            pass
+        except OSError as e:
+            self.logger.error(f"Cannot create snapshot directory {snapshot_dir}: {e}")
+            sys.exit(1)
+
+    def is_btrfs_subvolume(self, path: Path, st: Optional[os.stat_result] = None) -> bool:
+        fstype = self._mount_fstype(path)
+        if fstype is not None:
+            # Every btrfs subvolume root has inode 256 (BTRFS_FIRST_FREE_OBJECTID)
+            return fstype == 'btrfs' and (st or path.stat()).st_ino == 256
 
-    def is_btrfs_subvolume(self, path: Path) -> bool:
-        import subprocess
         try:
             result = subprocess.run(
                 ['btrfs', 'subvolume', 'show', str(path)],
@@ -77,14 +101,36 @@ class BtrfsSnapshotService:
         except FileNotFoundError:
             self.logger.error("btrfs command not found. Is btrfs-progs installed?")
             return False
+        except OSError as e:
+            self.logger.error(f"Could not run btrfs: {e}")
+            return False
 
-    def handle_file_change(self, event_type: str, file_path: str):
-        self.logger.info(f"File change detected - Type: {event_type}, Path: {file_path}")
+    @staticmethod
+    def _mount_fstype(path: Path) -> Optional[str]:
+        # Filesystem type of the mount containing path, from /proc/self/mountinfo;
+        # None where that file is unavailable (non-Linux)
+        try:
+            with open('/proc/self/mountinfo') as f:
+                mountinfo = f.read()
+        except OSError:
+            return None
+
+        target = str(path.resolve())
+        best_mount, best_fstype = '', None
+        for line in mountinfo.splitlines():
+            fields, _, tail = line.partition(' - ')
+            # The kernel octal-escapes space, tab, newline and backslash in paths
+            mount_point = re.sub(r'\\([0-7]{3})', lambda m: chr(int(m.group(1), 8)), fields.split()[4])
+            if target == mount_point or target.startswith(mount_point.rstrip('/') + '/'):
+                if len(mount_point) >= len(best_mount):
+                    best_mount, best_fstype = mount_point, tail.split()[0]
+        return best_fstype
 
-        success = self.snapshot_manager.create_snapshot(event_info=f"{event_type}: {file_path}")
+    def handle_file_change(self, event_type: str, file_path: str):
+        self.logger.info("File change detected - Type: %s, Path: %s", event_type, file_path)
 
-        if success:
-            self.snapshot_manager.cleanup_old_snapshots()
+        # Snapshot and cleanup run on the batcher's thread, one per cooldown window
+        self.batcher.submit(f"{event_type}: {file_path}")
 
     def signal_handler(self, signum, frame):
         self.logger.info(f"Received signal {signum}. Shutting down gracefully...")
@@ -98,11 +144,12 @@ class BtrfsSnapshotService:
         self.logger.info(f"Cleanup mode: {self.config.get('cleanup_mode', 'count')}")
 
         self.running = True
+        self.batcher.start()
         self.watcher.start()
 
         try:
-            while self.running:
-                time.sleep(1)
+            # Block until stop() instead of waking up every second to poll
+            self._stopped.wait()
         except KeyboardInterrupt:
             self.logger.info("Interrupted by user")
         finally:
@@ -112,6 +159,8 @@ class BtrfsSnapshotService:
         if self.running:
             self.running = False
             self.watcher.stop()
+            self.batcher.stop()
+            self._stopped.set()
             self.logger.info("Service stopped")
 
 
@@ -198,9 +247,9 @@ def main():
                 print(f"Cleaned up {len(deleted)} old snapshots")
 
             if args.snapshot_now:
-                success = manager.create_snapshot(event_info="Manual snapshot")
-                if success:
-                    print("Snapshot created successfully")
+                snapshot_path = manager.create_snapshot(event_info="Manual snapshot")
+                if snapshot_path:
+                    print(f"Snapshot created successfully: {snapshot_path}")
                 else:
                     print("Failed to create snapshot")
                     sys.exit(1)
@@ -2,12 +2,36 @@
 
 import os
 import sys
-import yaml
+import copy
 import json
 import logging
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, Any, Optional
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _load_yaml(stream) -> Any:
+    # PyYAML is imported on first use so JSON configs never pay for it;
+    # libyaml's C parser is used when PyYAML was built with it
+    import yaml
+    return yaml.load(stream, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
+
+
+@lru_cache(maxsize=8)
+def _parse_config_file(path: str, mtime_ns: int, size: int) -> Any:
+    # mtime and size are part of the key so an edited file is parsed again
+    with open(path, 'r') as f:
+        if path.endswith(('.yaml', '.yml')):
+            return _load_yaml(f)
+        if orjson is not None:
+            return orjson.loads(f.read())
+        return json.load(f)
+
 
 class ConfigLoader:
     DEFAULT_CONFIG = {
@@ -18,10 +42,22 @@ class ConfigLoader:
         'retention_days': 7,
         'cooldown_seconds': 60,
         'debounce_seconds': 5,
+        'cleanup_rate_per_min': 0,
+        'low_priority_maintenance': False,
         'log_file': '/var/log/btrfs_snapshot.log',
         'log_level': 'INFO'
     }
 
+    DEFAULT_LOCATIONS = (
+        'config.yaml',
+        'config.yml',
+        'config.json',
+        '/etc/btrfs-snapshot-manager/config.yaml',
+        '/etc/btrfs-snapshot-manager/config.yml',
+        '/etc/btrfs-snapshot-manager/config.json',
+        os.path.expanduser('~/.config/btrfs-snapshot-manager/config.yaml'),
+    )
+
     def __init__(self, config_path: Optional[str] = None):
         self.logger = logging.getLogger(__name__)
         self.config_path = self._find_config_file(config_path)
@@ -34,20 +70,11 @@ class ConfigLoader:
             else:
                 self.logger.warning(f"Config file not found: {config_path}")
 
-        default_locations = [
-            Path('config.yaml'),
-            Path('config.yml'),
-            Path('config.json'),
-            Path('/etc/btrfs-snapshot-manager/config.yaml'),
-            Path('/etc/btrfs-snapshot-manager/config.yml'),
-            Path('/etc/btrfs-snapshot-manager/config.json'),
-            Path.home() / '.config' / 'btrfs-snapshot-manager' / 'config.yaml',
-        ]
-
-        for location in default_locations:
-            if location.exists():
+        # Only the file that is found gets wrapped in a Path
+        for location in self.DEFAULT_LOCATIONS:
+            if os.path.exists(location):
                 self.logger.info(f"Found config file: {location}")
-                return location
+                return Path(location)
 
         self.logger.info("No config file found, using default configuration")
         return None
@@ -56,19 +83,18 @@ class ConfigLoader:
         config = self.DEFAULT_CONFIG.copy()
 
         if self.config_path:
+            if self.config_path.suffix not in ['.yaml', '.yml', '.json']:
+                self.logger.error(f"Unsupported config file format: {self.config_path}")
+                sys.exit(1)
+
             try:
-                with open(self.config_path, 'r') as f:
-                    if self.config_path.suffix in ['.yaml', '.yml']:
-                        file_config = yaml.safe_load(f)
-                    elif self.config_path.suffix == '.json':
-                        file_config = json.load(f)
-                    else:
-                        self.logger.error(f"Unsupported config file format: {self.config_path}")
-                        sys.exit(1)
-
-                    if file_config:
-                        config.update(file_config)
-                        self.logger.info(f"Loaded configuration from {self.config_path}")
+                st = os.stat(self.config_path)
+                file_config = _parse_config_file(str(self.config_path), st.st_mtime_ns, st.st_size)
+
+                if file_config:
+                    # Deep copy so callers can't mutate the cached parse result
+                    config.update(copy.deepcopy(file_config))
+                    self.logger.info(f"Loaded configuration from {self.config_path}")
 
             except Exception as e:
                 self.logger.error(f"Failed to load config file: {e}")
@@ -126,6 +152,10 @@ class ConfigLoader:
             self.logger.error("cooldown_seconds cannot be negative")
             sys.exit(1)
 
+        if config['cleanup_rate_per_min'] < 0:
+            self.logger.error("cleanup_rate_per_min cannot be negative")
+            sys.exit(1)
+
     def save_example_config(self, path: str = 'config.yaml.example'):
         example_config = {
             'watch_dir': '/data/mydir',
@@ -145,8 +175,11 @@ class ConfigLoader:
             ]
         }
 
+        import yaml
+
         with open(path, 'w') as f:
-            yaml.dump(example_config, f, default_flow_style=False, sort_keys=False)
+            yaml.dump(example_config, f, Dumper=getattr(yaml, 'CSafeDumper', yaml.SafeDumper),
+                      default_flow_style=False, sort_keys=False)
             f.write('\n# Configuration for Btrfs Snapshot Manager\n')
             f.write('# \n')
             f.write('# cleanup_mode: "count" or "time"\n')
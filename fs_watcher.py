@@ -1,29 +1,43 @@
 #!/usr/bin/env python3
 
 import os
+import re
 import time
 import logging
 import threading
 from pathlib import Path
-from typing import Callable, Set, Optional
-from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
 
 from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler, FileSystemEvent
+from watchdog.events import (
+    FileSystemEventHandler, FileSystemEvent,
+    FileCreatedEvent, FileModifiedEvent, FileDeletedEvent, FileMovedEvent, FileClosedEvent,
+    DirCreatedEvent, DirModifiedEvent, DirDeletedEvent, DirMovedEvent,
+)
 
 
 class FileSystemWatcher:
-    def __init__(self, watch_dir: str, callback: Callable, debounce_seconds: int = 5):
+    # Everything except FileOpenedEvent/FileClosedNoWriteEvent; on inotify the
+    # filter also sets the watch mask, so reading files never wakes us up
+    EVENT_FILTER = [
+        FileCreatedEvent, FileModifiedEvent, FileDeletedEvent, FileMovedEvent, FileClosedEvent,
+        DirCreatedEvent, DirModifiedEvent, DirDeletedEvent, DirMovedEvent,
+    ]
+
+    def __init__(self, watch_dir: str, callback: Callable, debounce_seconds: int = 5,
+                 on_event: Optional[Callable[[str], None]] = None):
         self.watch_dir = Path(watch_dir)
         self.callback = callback
         self.debounce_seconds = debounce_seconds
         self.logger = logging.getLogger(__name__)
+        self.running = False
 
         self.observer = Observer()
         self.handler = DebouncedEventHandler(
             callback=callback,
             debounce_seconds=debounce_seconds,
-            logger=self.logger
+            logger=self.logger,
+            on_event=on_event
         )
 
         self._setup_observer()
@@ -32,17 +46,21 @@ class FileSystemWatcher:
         self.observer.schedule(
             self.handler,
             str(self.watch_dir),
-            recursive=True
+            recursive=True,
+            event_filter=self.EVENT_FILTER
         )
         self.logger.info(f"File watcher configured for: {self.watch_dir}")
 
     def start(self):
         self.observer.start()
+        self.running = True
         self.logger.info("File system watcher started")
 
     def stop(self):
+        self.running = False
         self.observer.stop()
         self.observer.join(timeout=5)
+        self.handler.stop()
         self.logger.info("File system watcher stopped")
 
     def is_alive(self) -> bool:
@@ -50,16 +68,26 @@ class FileSystemWatcher:
 
 
 class DebouncedEventHandler(FileSystemEventHandler):
-    def __init__(self, callback: Callable, debounce_seconds: int, logger: logging.Logger):
+    # Access-only events that never change directory contents
+    READ_ONLY_EVENTS = ('opened', 'closed_no_write')
+
+    def __init__(self, callback: Callable, debounce_seconds: int, logger: logging.Logger,
+                 on_event: Optional[Callable[[str], None]] = None):
         super().__init__()
         self.callback = callback
+        self.on_event = on_event
         self.debounce_seconds = debounce_seconds
         self.logger = logger
 
-        self.pending_events: Set[str] = set()
-        self.last_event_time: Optional[datetime] = None
-        self.timer: Optional[threading.Timer] = None
+        # path -> event type; 'modified' wins so repeated saves of a file stay one entry
+        self.pending_events: Dict[str, str] = {}
         self.lock = threading.Lock()
+        # A single long-lived worker sleeps until the deadline each event pushes
+        # back, instead of a new Timer thread for every event
+        self._deadline = 0.0
+        self._wakeup = threading.Condition(self.lock)
+        self._worker: Optional[threading.Thread] = None
+        self._stopping = False
 
         self.ignore_patterns = [
             '*.tmp',
@@ -74,54 +102,93 @@ class DebouncedEventHandler(FileSystemEventHandler):
             '.DS_Store',
             'Thumbs.db'
         ]
-
-    def should_ignore(self, path: str) -> bool:
-        path_obj = Path(path)
-        name = path_obj.name
-
-        for pattern in self.ignore_patterns:
+        self._ignore_re = self._compile_ignore_patterns(self.ignore_patterns)
+
+    @staticmethod
+    def _compile_ignore_patterns(patterns: list) -> re.Pattern:
+        # '*.ext' matches the file name suffix, 'prefix*' the file name prefix,
+        # anything else a substring of the full path
+        sep = re.escape(os.sep)
+        alternatives = []
+        for pattern in patterns:
             if pattern.startswith('*.'):
-                if name.endswith(pattern[1:]):
-                    return True
+                alternatives.append(re.escape(pattern[1:]) + '$')
             elif pattern.endswith('*'):
-                if name.startswith(pattern[:-1]):
-                    return True
-            elif pattern in str(path_obj):
-                return True
+                alternatives.append(f"(?:^|{sep}){re.escape(pattern[:-1])}[^{sep}]*$")
+            else:
+                alternatives.append(re.escape(pattern))
+        return re.compile('|'.join(alternatives))
 
-        return False
+    def should_ignore(self, path: str) -> bool:
+        return self._ignore_re.search(path) is not None
 
     def on_any_event(self, event: FileSystemEvent):
+        if self.on_event and event.event_type not in self.READ_ONLY_EVENTS:
+            # Undebounced and unfiltered, for callers tracking directory contents
+            self._notify_event(event)
+
         if event.is_directory:
             return
 
         if self.should_ignore(event.src_path):
-            self.logger.debug(f"Ignoring event for: {event.src_path}")
+            self.logger.debug("Ignoring event for: %s", event.src_path)
             return
 
         event_type = event.event_type
         file_path = event.src_path
 
         with self.lock:
-            self.pending_events.add(f"{event_type}:{file_path}")
-            self.last_event_time = datetime.now()
+            if self.pending_events.get(file_path) != 'modified':
+                self.pending_events[file_path] = event_type
+            self._deadline = time.monotonic() + self.debounce_seconds
+
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._debounce_loop, daemon=True)
+                self._worker.start()
+            else:
+                self._wakeup.notify()
+
+        self.logger.debug("Event queued - Type: %s, Path: %s", event_type, file_path)
+
+    def _notify_event(self, event: FileSystemEvent):
+        try:
+            self.on_event(event.src_path)
+            dest_path = getattr(event, 'dest_path', '')
+            if dest_path:
+                self.on_event(dest_path)
+        except Exception as e:
+            self.logger.error(f"Error in event listener: {e}", exc_info=True)
+
+    def stop(self):
+        with self.lock:
+            self._stopping = True
+            self._wakeup.notify()
+
+    def _debounce_loop(self):
+        while True:
+            with self.lock:
+                while not self.pending_events and not self._stopping:
+                    self._wakeup.wait()
 
-            if self.timer:
-                self.timer.cancel()
+                remaining = self._deadline - time.monotonic()
+                while remaining > 0 and not self._stopping:
+                    self._wakeup.wait(remaining)
+                    remaining = self._deadline - time.monotonic()
 
-            self.timer = threading.Timer(self.debounce_seconds, self._process_events)
-            self.timer.start()
+                if self._stopping:
+                    if self.pending_events:
+                        self.logger.info(f"Dropping {len(self.pending_events)} pending events on shutdown")
+                    return
 
-            self.logger.debug(f"Event queued - Type: {event_type}, Path: {file_path}")
+            self._process_events()
 
     def _process_events(self):
         with self.lock:
             if not self.pending_events:
                 return
 
-            events_to_process = list(self.pending_events)
-            self.pending_events.clear()
-            self.timer = None
+            events_to_process = self.pending_events
+            self.pending_events = {}
 
         self.logger.info(f"Processing {len(events_to_process)} debounced events")
 
@@ -132,14 +199,9 @@ class DebouncedEventHandler(FileSystemEventHandler):
         except Exception as e:
             self.logger.error(f"Error in callback: {e}", exc_info=True)
 
-    def _summarize_events(self, events: list) -> dict:
-        event_types = set()
-        affected_files = set()
-
-        for event in events:
-            event_type, file_path = event.split(':', 1)
-            event_types.add(event_type)
-            affected_files.add(Path(file_path).name)
+    def _summarize_events(self, events: Dict[str, str]) -> dict:
+        event_types = set(events.values())
+        affected_files = {os.path.basename(file_path) for file_path in events}
 
         if len(affected_files) <= 3:
             file_list = ', '.join(affected_files)
@@ -155,83 +217,3 @@ class DebouncedEventHandler(FileSystemEventHandler):
             'unique_files': len(affected_files)
         }
 
-
-class InotifyWatcher:
-    def __init__(self, watch_dir: str, callback: Callable, debounce_seconds: int = 5):
-        self.watch_dir = Path(watch_dir)
-        self.callback = callback
-        self.debounce_seconds = debounce_seconds
-        self.logger = logging.getLogger(__name__)
-        self.running = False
-
-        try:
-            import inotify.adapters
-            self.inotify_available = True
-            self.inotify = inotify.adapters.InotifyTree(str(self.watch_dir))
-        except ImportError:
-            self.logger.info("inotify not available, falling back to watchdog")
-            self.inotify_available = False
-
-    def start(self):
-        if not self.inotify_available:
-            raise RuntimeError("inotify is not available")
-
-        self.running = True
-        self.thread = threading.Thread(target=self._watch_loop)
-        self.thread.daemon = True
-        self.thread.start()
-        self.logger.info("Inotify watcher started")
-
-    def stop(self):
-        self.running = False
-        if hasattr(self, 'thread'):
-            self.thread.join(timeout=5)
-        self.logger.info("Inotify watcher stopped")
-
-    def _watch_loop(self):
-        last_event_time = None
-        pending_events = []
-
-        while self.running:
-            try:
-                events = self.inotify.event_gen(timeout_s=1)
-                for event in events:
-                    if event is not None:
-                        (header, type_names, watch_path, filename) = event
-
-                        if filename and not filename.startswith('.'):
-                            current_time = time.time()
-
-                            if last_event_time is None or (current_time - last_event_time) > self.debounce_seconds:
-                                if pending_events:
-                                    self._process_pending_events(pending_events)
-                                    pending_events = []
-
-                            pending_events.append((type_names, os.path.join(watch_path, filename)))
-                            last_event_time = current_time
-
-                if pending_events and last_event_time:
-                    if (time.time() - last_event_time) > self.debounce_seconds:
-                        self._process_pending_events(pending_events)
-                        pending_events = []
-                        last_event_time = None
-
-            except Exception as e:
-                self.logger.error(f"Error in inotify loop: {e}", exc_info=True)
-                time.sleep(1)
-
-    def _process_pending_events(self, events):
-        if not events:
-            return
-
-        event_types = set()
-        for type_names, _ in events:
-            event_types.update(type_names)
-
-        primary_type = 'modified' if 'IN_MODIFY' in event_types else 'created'
-        file_count = len(set(path for _, path in events))
-
-        self.callback(primary_type, f"{file_count} file(s)")
-
-    def is_alive(self) -> bool:
-        return self.running and hasattr(self, 'thread') and self.thread.is_alive()
\ No newline at end of file
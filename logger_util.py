@@ -2,10 +2,38 @@
 
 import os
 import sys
+import queue
+import atexit
 import logging
 import logging.handlers
 from pathlib import Path
 from datetime import datetime
+from typing import Optional
+
+
+_queue_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def _add_file_handler(logger: logging.Logger, file_handler: logging.Handler):
+    # Logging threads only enqueue records; writes and rotation happen on the
+    # listener thread, so slow disks don't stall the watcher or snapshot paths
+    global _queue_listener
+    stop_logging()
+
+    log_queue = queue.SimpleQueue()
+    _queue_listener = logging.handlers.QueueListener(log_queue, file_handler, respect_handler_level=True)
+    _queue_listener.start()
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+
+
+def stop_logging():
+    global _queue_listener
+    if _queue_listener is not None:
+        _queue_listener.stop()
+        _queue_listener = None
+
+
+atexit.register(stop_logging)
 
 
 def setup_logging(log_file: str = '/var/log/btrfs_snapshot.log',
@@ -39,7 +67,7 @@ def setup_logging(log_file: str = '/var/log/btrfs_snapshot.log',
         )
         file_handler.setLevel(level)
         file_handler.setFormatter(log_format)
-        logger.addHandler(file_handler)
+        _add_file_handler(logger, file_handler)
 
     except PermissionError:
         if console:
@@ -54,7 +82,7 @@ def setup_logging(log_file: str = '/var/log/btrfs_snapshot.log',
                 )
                 file_handler.setLevel(level)
                 file_handler.setFormatter(log_format)
-                logger.addHandler(file_handler)
+                _add_file_handler(logger, file_handler)
                 logger.warning(f"Using fallback log location: {fallback_log}")
             except Exception as e:
                 if console:
@@ -1,19 +1,65 @@
 #!/usr/bin/env python3
 
 import os
+import errno
+import ctypes
+import platform
 import subprocess
 import logging
 import shutil
+import threading
+import time
 from pathlib import Path
 from datetime import datetime, timedelta
-from typing import List, Optional, Tuple
-import psutil
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+import btrfs_ioctl
+
+
+# ioprio_set(2) has no libc wrapper; syscall numbers per architecture
+SYS_IOPRIO_SET = {'x86_64': 251, 'aarch64': 30, 'i686': 289, 'armv7l': 314}
+IOPRIO_WHO_PROCESS = 1
+IOPRIO_CLASS_IDLE = 3
+IOPRIO_CLASS_SHIFT = 13
+
+
+def lower_thread_priority(logger: logging.Logger):
+    # Both settings are per-thread on Linux and inherited by the btrfs
+    # subprocesses this thread spawns, so the watcher and API threads keep theirs
+    try:
+        os.nice(10)
+    except OSError as e:
+        logger.warning(f"Could not lower CPU priority: {e}")
+
+    syscall_nr = SYS_IOPRIO_SET.get(platform.machine())
+    if syscall_nr is None:
+        return
+
+    libc = ctypes.CDLL(None, use_errno=True)
+    if libc.syscall(syscall_nr, IOPRIO_WHO_PROCESS, 0, IOPRIO_CLASS_IDLE << IOPRIO_CLASS_SHIFT) != 0:
+        logger.warning(f"Could not set idle I/O priority: {os.strerror(ctypes.get_errno())}")
+
+
+def _tree_size(root: Path) -> int:
+    # Iterative scandir walk: entry types come from readdir, one stat per file
+    total = 0
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    total += entry.stat(follow_symlinks=False).st_size
+    return total
 
 
 class SnapshotManager:
+    ENTRIES_CACHE_SETTLE_NS = 1_000_000_000
+
     def __init__(self, watch_dir: str, snapshot_dir: str, max_snapshots: int = 50,
                  cleanup_mode: str = 'count', retention_days: int = 7,
-                 cooldown_seconds: int = 60, test_mode: bool = False):
+                 cooldown_seconds: int = 60, test_mode: bool = False, use_ioctl: bool = True):
         self.watch_dir = Path(watch_dir)
         self.snapshot_dir = Path(snapshot_dir)
         self.max_snapshots = max_snapshots
@@ -21,26 +67,40 @@ class SnapshotManager:
         self.retention_days = retention_days
         self.cooldown_seconds = cooldown_seconds
         self.test_mode = test_mode
+        # Talk to the kernel directly instead of spawning the btrfs binary;
+        # switched off for good if the ioctls turn out to be unsupported
+        self.use_ioctl = use_ioctl
 
         self.logger = logging.getLogger(__name__)
         self.last_snapshot_time: Optional[datetime] = None
+        # Cooldown runs on the monotonic clock; last_snapshot_time is for display
+        self._last_snapshot_mono: Optional[float] = None
+        # Monotonic time until which a failed free-space check is trusted
+        self._low_space_until = 0.0
+        # (snapshot_dir st_mtime_ns, sorted entries) from the last listing
+        self._entries_cache: Optional[Tuple[int, List[os.DirEntry]]] = None
+        # Unknown until the first size query; False once quotas turn out to be off
+        self._qgroups_available: Optional[bool] = None
 
         self.snapshot_prefix = self.watch_dir.name
+        self._name_prefix = f"{self.snapshot_prefix}_"
 
         if not self.snapshot_dir.exists():
             self.snapshot_dir.mkdir(parents=True, exist_ok=True)
 
-    def create_snapshot(self, event_info: str = "") -> bool:
+    def create_snapshot(self, event_info: str = "") -> Optional[Path]:
         if not self._check_cooldown():
             self.logger.info(f"Skipping snapshot - cooldown period active (last snapshot: {self.last_snapshot_time})")
-            return False
+            return None
 
         if not self._check_disk_space():
             self.logger.error("Insufficient disk space for snapshot")
-            return False
+            return None
 
-        # Add microseconds to ensure unique timestamps in test mode
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]  # Use milliseconds
+        # Add milliseconds to ensure unique timestamps in test mode
+        now_ns = time.time_ns()
+        seconds, sub_ns = divmod(now_ns, 1_000_000_000)
+        timestamp = f"{time.strftime('%Y%m%d_%H%M%S', time.localtime(seconds))}_{sub_ns // 1_000_000:03d}"
         snapshot_name = f"{self.snapshot_prefix}_{timestamp}"
         snapshot_path = self.snapshot_dir / snapshot_name
 
@@ -50,7 +110,7 @@ class SnapshotManager:
                 if not snapshot_path.exists():
                     snapshot_path.mkdir(parents=True, exist_ok=True)
                     (snapshot_path / "test_file.txt").write_text(f"Test snapshot created at {timestamp}")
-            else:
+            elif not self._try_ioctl(btrfs_ioctl.create_snapshot, self.watch_dir, snapshot_path):
                 cmd = [
                     'btrfs', 'subvolume', 'snapshot',
                     str(self.watch_dir),
@@ -67,35 +127,50 @@ class SnapshotManager:
                 if result.returncode != 0:
                     raise subprocess.CalledProcessError(result.returncode, cmd, result.stdout, result.stderr)
 
-            self.last_snapshot_time = datetime.now()
+            self.last_snapshot_time = datetime.fromtimestamp(now_ns / 1e9)
+            self._last_snapshot_mono = time.monotonic()
+            self._entries_cache = None
             self.logger.info(f"Snapshot created: {snapshot_path}")
 
             if event_info:
                 self.logger.info(f"Triggered by: {event_info}")
 
-            return True
+            return snapshot_path
 
         except subprocess.CalledProcessError as e:
             self.logger.error(f"Failed to create snapshot: {e.stderr}")
-            return False
+            return None
+        except OSError as e:
+            self.logger.error(f"Failed to create snapshot: {e}")
+            return None
         except Exception as e:
             self.logger.error(f"Unexpected error creating snapshot: {e}", exc_info=True)
-            return False
+            return None
 
-    def _check_cooldown(self) -> bool:
-        if self.last_snapshot_time is None:
-            return True
+    def cooldown_remaining(self) -> float:
+        if self._last_snapshot_mono is None:
+            return 0.0
+
+        return max(0.0, self.cooldown_seconds - (time.monotonic() - self._last_snapshot_mono))
 
-        elapsed = (datetime.now() - self.last_snapshot_time).total_seconds()
-        return elapsed >= self.cooldown_seconds
+    def _check_cooldown(self) -> bool:
+        return (self._last_snapshot_mono is None
+                or time.monotonic() - self._last_snapshot_mono >= self.cooldown_seconds)
 
     def _check_disk_space(self, min_free_gb: float = 1.0) -> bool:
+        # A full disk does not arm the cooldown, so without this every event
+        # would statvfs and log the same warning again
+        if time.monotonic() < self._low_space_until:
+            return False
+
         try:
-            stat = shutil.disk_usage(self.snapshot_dir)
-            free_gb = stat.free / (1024 ** 3)
+            # Same figure shutil.disk_usage reports as free, without its namedtuple
+            st = os.statvfs(self.snapshot_dir)
+            free_gb = st.f_bavail * st.f_frsize / (1024 ** 3)
 
             if free_gb < min_free_gb:
                 self.logger.warning(f"Low disk space: {free_gb:.2f} GB free")
+                self._low_space_until = time.monotonic() + max(1.0, self.cooldown_seconds / 2)
                 return False
 
             return True
@@ -103,35 +178,87 @@ class SnapshotManager:
             self.logger.error(f"Failed to check disk space: {e}")
             return True
 
-    def list_snapshots(self) -> List[Path]:
+    def _try_ioctl(self, operation: Callable, *args) -> bool:
+        # False sends the caller to the btrfs command. Errors the command would
+        # run into just the same are raised instead, so they are reported once
+        if not self.use_ioctl:
+            return False
+
         try:
-            snapshots = []
+            operation(*args)
+            return True
+        except OSError as e:
+            if e.errno in (errno.ENOTTY, errno.ENOSYS, errno.EOPNOTSUPP, errno.EINVAL):
+                self.logger.info(f"btrfs ioctls unavailable ({e.strerror}), using the btrfs command")
+                self.use_ioctl = False
+            elif e.errno in (errno.EEXIST, errno.EPERM, errno.EACCES, errno.ENOENT):
+                raise
+            else:
+                self.logger.debug(f"btrfs ioctl {operation.__name__} failed: {e}")
+            return False
 
-            for item in self.snapshot_dir.iterdir():
-                # 包含所有有效的快照目录（排除.和..）
-                if item.is_dir() and item.name not in ['.', '..']:
-                    snapshots.append(item)
+    def list_snapshots(self) -> List[Path]:
+        return [Path(entry.path) for entry in self.list_snapshot_entries()]
 
-            snapshots.sort(key=lambda x: x.stat().st_mtime)
-            return snapshots
+    def list_snapshot_entries(self) -> List[os.DirEntry]:
+        try:
+            # Adding or removing a snapshot, by us or anyone else, changes the
+            # directory's mtime; while it is unchanged the last sorted listing holds
+            now_ns = time.time_ns()
+            dir_mtime = os.stat(self.snapshot_dir).st_mtime_ns
+            cached = self._entries_cache
+            if cached is not None and cached[0] == dir_mtime:
+                return list(cached[1])
+
+            with os.scandir(self.snapshot_dir) as it:
+                # 包含所有有效的快照目录；类型直接取自readdir的d_type，符号链接不算快照
+                snapshots = [entry for entry in it if entry.is_dir(follow_symlinks=False)]
+
+            snapshots.sort(key=self._snapshot_time)
+            # mtime has clock-tick granularity: a change within the same tick as the
+            # one we just saw would keep the same mtime, so only cache settled listings
+            if now_ns - dir_mtime >= self.ENTRIES_CACHE_SETTLE_NS:
+                self._entries_cache = (dir_mtime, snapshots)
+            else:
+                self._entries_cache = None
+            return list(snapshots)
 
         except Exception as e:
             self.logger.error(f"Failed to list snapshots: {e}", exc_info=True)
             return []
 
-    def cleanup_old_snapshots(self) -> List[str]:
+    def _snapshot_time(self, entry: os.DirEntry) -> datetime:
+        # Our snapshot names embed their creation time, which needs no stat; a real
+        # btrfs snapshot's mtime is inherited from the source directory anyway.
+        # Other directory names fall back to mtime.
+        name = entry.name
+        if name.startswith(self._name_prefix):
+            try:
+                return datetime.strptime(name[len(self._name_prefix):], "%Y%m%d_%H%M%S_%f")
+            except ValueError:
+                pass
+        return datetime.fromtimestamp(entry.stat().st_mtime)
+
+    def list_snapshots_with_stat(self) -> List[Tuple[str, str, float, int]]:
+        snapshots = []
+        for entry in self.list_snapshot_entries():
+            stat = entry.stat()
+            snapshots.append((entry.name, entry.path, stat.st_mtime, stat.st_size))
+        return snapshots
+
+    def cleanup_old_snapshots(self, limit: Optional[int] = None) -> List[str]:
         deleted = []
 
         try:
-            snapshots = self.list_snapshots()
+            entries = self.list_snapshot_entries()
 
-            if not snapshots:
+            if not entries:
                 return deleted
 
             if self.cleanup_mode == 'count':
-                deleted = self._cleanup_by_count(snapshots)
+                deleted = self._cleanup_by_count([entry.path for entry in entries], limit)
             elif self.cleanup_mode == 'time':
-                deleted = self._cleanup_by_time(snapshots)
+                deleted = self._cleanup_by_time(entries, limit)
             else:
                 self.logger.error(f"Unknown cleanup mode: {self.cleanup_mode}")
 
@@ -140,7 +267,7 @@ class SnapshotManager:
 
         return deleted
 
-    def _cleanup_by_count(self, snapshots: List[Path]) -> List[str]:
+    def _cleanup_by_count(self, snapshots: List[str], limit: Optional[int] = None) -> List[str]:
         deleted = []
 
         if len(snapshots) <= self.max_snapshots:
@@ -148,42 +275,73 @@ class SnapshotManager:
             return deleted
 
         snapshots_to_delete = snapshots[:-self.max_snapshots]
+        if limit is not None:
+            # Oldest first; the rest are picked up by later cleanups
+            snapshots_to_delete = snapshots_to_delete[:limit]
 
-        for snapshot in snapshots_to_delete:
-            if self._delete_snapshot(snapshot):
-                deleted.append(str(snapshot))
+        deleted = self._delete_snapshots(snapshots_to_delete)
 
         if deleted:
             self.logger.info(f"Deleted {len(deleted)} old snapshots (keeping {self.max_snapshots})")
 
         return deleted
 
-    def _cleanup_by_time(self, snapshots: List[Path]) -> List[str]:
+    def _cleanup_by_time(self, snapshots: List[os.DirEntry], limit: Optional[int] = None) -> List[str]:
         deleted = []
-        cutoff_time = datetime.now() - timedelta(days=self.retention_days)
+        now = datetime.now()
+        cutoff_time = now - timedelta(days=self.retention_days)
+
+        expired = {}
+        for entry in snapshots:
+            if limit is not None and len(expired) >= limit:
+                break
 
-        for snapshot in snapshots:
             try:
-                snapshot_time = datetime.fromtimestamp(snapshot.stat().st_mtime)
+                snapshot_time = self._snapshot_time(entry)
 
-                if snapshot_time < cutoff_time:
-                    if self._delete_snapshot(snapshot):
-                        deleted.append(str(snapshot))
-                        self.logger.info(f"Deleted old snapshot: {snapshot.name} (age: {(datetime.now() - snapshot_time).days} days)")
+                # Listed oldest first, so everything after this one is newer too
+                if snapshot_time >= cutoff_time:
+                    break
+                expired[entry.path] = (entry.name, snapshot_time)
 
             except Exception as e:
-                self.logger.error(f"Error checking snapshot age for {snapshot}: {e}")
+                self.logger.error(f"Error checking snapshot age for {entry.path}: {e}")
+
+        for snapshot in self._delete_snapshots(list(expired)):
+            deleted.append(snapshot)
+            name, snapshot_time = expired[snapshot]
+            self.logger.info(f"Deleted old snapshot: {name} (age: {(now - snapshot_time).days} days)")
 
         return deleted
 
-    def _delete_snapshot(self, snapshot_path: Path) -> bool:
+    def _delete_snapshots(self, snapshot_paths: List[str]) -> List[str]:
+        # Per-path deletes are a single ioctl each; batching only saves btrfs forks
+        if self.test_mode or self.use_ioctl or len(snapshot_paths) <= 1:
+            return [path for path in snapshot_paths if self._delete_snapshot(path)]
+
+        # btrfs-progs accepts several subvolumes per call: one fork/exec for the whole batch
+        self._entries_cache = None
+        cmd = ['btrfs', 'subvolume', 'delete', *snapshot_paths]
+        try:
+            subprocess.run(cmd, capture_output=True, text=True, check=True)
+        except (subprocess.CalledProcessError, OSError) as e:
+            # Find out which ones went: retry whatever is still there one by one
+            self.logger.warning(f"Batched snapshot delete failed, retrying individually: {getattr(e, 'stderr', e)}")
+            return [path for path in snapshot_paths if not os.path.exists(path) or self._delete_snapshot(path)]
+
+        for path in snapshot_paths:
+            self.logger.info(f"Deleted snapshot: {path}")
+        return list(snapshot_paths)
+
+    def _delete_snapshot(self, snapshot_path: Union[str, Path]) -> bool:
+        self._entries_cache = None
         try:
             if self.test_mode:
                 self.logger.info(f"[TEST MODE] Would delete snapshot: {snapshot_path}")
-                if snapshot_path.exists():
+                if os.path.exists(snapshot_path):
                     shutil.rmtree(snapshot_path)
-            else:
-                cmd = ['btrfs', 'subvolume', 'delete', str(snapshot_path)]
+            elif not self._try_ioctl(btrfs_ioctl.delete_subvolume, snapshot_path):
+                cmd = ['btrfs', 'subvolume', 'delete', os.fspath(snapshot_path)]
                 result = subprocess.run(
                     cmd,
                     capture_output=True,
@@ -200,32 +358,30 @@ class SnapshotManager:
         except subprocess.CalledProcessError as e:
             self.logger.error(f"Failed to delete snapshot {snapshot_path}: {e.stderr}")
             return False
+        except OSError as e:
+            self.logger.error(f"Failed to delete snapshot {snapshot_path}: {e}")
+            return False
         except Exception as e:
             self.logger.error(f"Unexpected error deleting snapshot {snapshot_path}: {e}", exc_info=True)
             return False
 
-    def get_snapshot_info(self) -> dict:
-        snapshots = self.list_snapshots()
+    def get_snapshot_info(self, snapshots: Optional[List[Path]] = None) -> dict:
+        if snapshots is None:
+            snapshots = self.list_snapshots()
         total_size = 0
 
-        for snapshot in snapshots:
-            try:
-                if self.test_mode:
-                    size = sum(f.stat().st_size for f in snapshot.rglob('*') if f.is_file())
-                else:
-                    cmd = ['btrfs', 'filesystem', 'du', '-s', str(snapshot)]
-                    result = subprocess.run(cmd, capture_output=True, text=True)
-                    if result.returncode == 0:
-                        lines = result.stdout.strip().split('\n')
-                        if lines:
-                            size_str = lines[-1].split()[0]
-                            try:
-                                size = self._parse_size(size_str)
-                                total_size += size
-                            except:
-                                pass
-            except:
-                pass
+        if self.test_mode:
+            for snapshot in snapshots:
+                try:
+                    total_size += _tree_size(snapshot)
+                except OSError:
+                    pass
+        elif snapshots:
+            qgroup_sizes = self._qgroup_sizes()
+            if qgroup_sizes is not None:
+                total_size = sum(qgroup_sizes.get(snapshot.name, 0) for snapshot in snapshots)
+            else:
+                total_size = self._du_total_size(snapshots)
 
         return {
             'count': len(snapshots),
@@ -235,18 +391,167 @@ class SnapshotManager:
             'last_snapshot_time': self.last_snapshot_time.isoformat() if self.last_snapshot_time else None
         }
 
-    def _parse_size(self, size_str: str) -> int:
-        size_str = size_str.upper()
-        multipliers = {
-            'B': 1,
-            'K': 1024,
-            'M': 1024**2,
-            'G': 1024**3,
-            'T': 1024**4
-        }
+    def _qgroup_sizes(self) -> Optional[Dict[str, int]]:
+        # Referenced bytes per snapshot name from btrfs quota groups, which the
+        # kernel already tracks: two btrfs calls however many snapshots there are,
+        # and no extent walk. None when quotas are not enabled.
+        if self._qgroups_available is False:
+            return None
+
+        try:
+            listing = subprocess.run(['btrfs', 'subvolume', 'list', '-o', str(self.snapshot_dir)],
+                                     capture_output=True, text=True)
+            qgroups = subprocess.run(['btrfs', 'qgroup', 'show', '--raw', str(self.snapshot_dir)],
+                                     capture_output=True, text=True)
+        except OSError:
+            listing = qgroups = None
+
+        if listing is None or listing.returncode != 0 or qgroups.returncode != 0:
+            self._qgroups_available = False
+            self.logger.info("btrfs quotas not available, measuring snapshot sizes with 'btrfs filesystem du'")
+            return None
+        self._qgroups_available = True
+
+        # "ID 257 gen 12 top level 5 path snapshots/<name>"
+        names = {}
+        for line in listing.stdout.splitlines():
+            head, sep, path = line.partition(' path ')
+            fields = head.split()
+            if sep and len(fields) >= 2 and fields[0] == 'ID':
+                names[f"0/{fields[1]}"] = os.path.basename(path)
+
+        # "qgroupid rfer excl [...]"
+        sizes = {}
+        for line in qgroups.stdout.splitlines():
+            fields = line.split()
+            if len(fields) >= 2 and fields[0] in names and fields[1].isdigit():
+                sizes[names[fields[0]]] = int(fields[1])
+        return sizes
+
+    def _du_total_size(self, snapshots: List[Path]) -> int:
+        # One btrfs invocation for all snapshots; --raw prints plain byte counts
+        total_size = 0
+        cmd = ['btrfs', 'filesystem', 'du', '-s', '--raw', *map(str, snapshots)]
+        try:
+            # Summed as btrfs prints, rather than buffering the whole output
+            with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                  text=True) as proc:
+                # Header line, then "total exclusive shared path" per snapshot; paths
+                # btrfs could not measure are reported on stderr and simply missing
+                next(proc.stdout, None)
+                for line in proc.stdout:
+                    fields = line.split(None, 1)
+                    if fields and fields[0].isdigit():
+                        total_size += int(fields[0])
+        except OSError:
+            pass
+        return total_size
+
+
+# Runs snapshot + cleanup on a worker thread; requests queued while a snapshot
+# is in progress or the cooldown is active are coalesced into a single
+# follow-up snapshot. With cleanup_rate_per_min set, deletions go through a
+# token bucket so a large backlog is removed gradually instead of in one burst.
+class SnapshotBatcher:
+    # Beyond this only a counter grows, so an event storm during a slow
+    # snapshot can't pile up unbounded strings on the watcher's behalf.
+    MAX_PENDING = 256
+
+    def __init__(self, manager: SnapshotManager, on_snapshot: Optional[Callable[[], None]] = None,
+                 cleanup_rate_per_min: float = 0, low_priority: bool = False):
+        self.manager = manager
+        self.on_snapshot = on_snapshot
+        self.low_priority = low_priority
+        self.cleanup_rate_per_min = cleanup_rate_per_min
+        # At least one token, or rates below 1/min would never allow a deletion
+        self._cleanup_capacity = max(1.0, float(cleanup_rate_per_min))
+        self._cleanup_tokens = self._cleanup_capacity
+        self._cleanup_refilled = time.monotonic()
+        self.logger = logging.getLogger(__name__)
+
+        self._pending: List[str] = []
+        self._dropped = 0
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5):
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+
+        if self._thread:
+            self._thread.join(timeout=timeout)
+
+    def submit(self, event_info: str):
+        with self._condition:
+            if len(self._pending) < self.MAX_PENDING:
+                self._pending.append(event_info)
+            else:
+                self._dropped += 1
+            self._condition.notify()
+
+    def _run(self):
+        if self.low_priority:
+            lower_thread_priority(self.logger)
+
+        while True:
+            with self._condition:
+                while self._running and not self._pending:
+                    self._condition.wait()
+
+                # Hold requests until the cooldown has passed, rather than letting
+                # create_snapshot reject them and lose the latest changes
+                delay = self.manager.cooldown_remaining()
+                while self._running and delay > 0:
+                    self._condition.wait(delay)
+                    delay = self.manager.cooldown_remaining()
+
+                if not self._running:
+                    if self._pending:
+                        self.logger.info(f"Dropping {len(self._pending) + self._dropped} pending snapshot requests on shutdown")
+                    return
+
+                events = self._pending
+                total = len(events) + self._dropped
+                self._pending = []
+                self._dropped = 0
+
+            self._process(events, total)
+
+    def _process(self, events: List[str], total: Optional[int] = None):
+        total = total or len(events)
+        if total == 1:
+            event_info = events[0]
+        else:
+            event_info = f"{total} batched changes ({'; '.join(events[:3])}{'; ...' if total > 3 else ''})"
+
+        try:
+            if self.manager.create_snapshot(event_info):
+                self._cleanup()
+                if self.on_snapshot:
+                    self.on_snapshot()
+        except Exception as e:
+            self.logger.error(f"Error processing snapshot request: {e}", exc_info=True)
+
+    def _cleanup(self):
+        if not self.cleanup_rate_per_min:
+            self.manager.cleanup_old_snapshots()
+            return
+
+        now = time.monotonic()
+        refill = (now - self._cleanup_refilled) * self.cleanup_rate_per_min / 60
+        self._cleanup_tokens = min(self._cleanup_capacity, self._cleanup_tokens + refill)
+        self._cleanup_refilled = now
 
-        for suffix, multiplier in multipliers.items():
-            if size_str.endswith(suffix):
-                return int(float(size_str[:-1]) * multiplier)
+        limit = int(self._cleanup_tokens)
+        if limit < 1:
+            return
 
-        return int(float(size_str))
\ No newline at end of file
+        deleted = self.manager.cleanup_old_snapshots(limit=limit)
+        self._cleanup_tokens -= len(deleted)
@@ -52,7 +52,7 @@ class ComprehensiveTest:
         """记录测试结果"""
         result = {
             'test': test_name,
-            'success': success,
+            'success': bool(success),
             'details': details,
             'duration': f"{duration:.2f}s",
             'timestamp': datetime.now().isoformat()
@@ -225,7 +225,7 @@ class ComprehensiveTest:
 
         import yaml
         with open(config_file, 'w') as f:
-            yaml.dump(config_content, f)
+            yaml.dump(config_content, f, Dumper=getattr(yaml, 'CSafeDumper', yaml.SafeDumper))
 
         # 加载配置
         loader = ConfigLoader(str(config_file))
@@ -12,12 +12,14 @@ from pathlib import Path
 class APITester:
     def __init__(self, base_url="http://127.0.0.1:5000"):
         self.base_url = base_url
+        # 所有请求共用一个会话，复用TCP连接
+        self.session = requests.Session()
 
     def test_health(self):
         """测试健康检查"""
         print("🔍 测试健康检查...")
         try:
-            response = requests.get(f"{self.base_url}/api/health")
+            response = self.session.get(f"{self.base_url}/api/health")
             if response.status_code == 200:
                 data = response.json()
                 print(f"✅ 健康检查成功: {data['status']}")
@@ -33,7 +35,7 @@ class APITester:
         """测试配置获取"""
         print("🔍 测试配置获取...")
         try:
-            response = requests.get(f"{self.base_url}/api/config")
+            response = self.session.get(f"{self.base_url}/api/config")
             if response.status_code == 200:
                 config = response.json()
                 print(f"✅ 配置获取成功")
@@ -53,7 +55,7 @@ class APITester:
         print("🔍 测试创建快照...")
         try:
             data = {"description": "API测试快照"}
-            response = requests.post(f"{self.base_url}/api/snapshots", json=data)
+            response = self.session.post(f"{self.base_url}/api/snapshots", json=data)
             if response.status_code == 200:
                 result = response.json()
                 if result['success']:
@@ -73,7 +75,7 @@ class APITester:
         """测试列出快照"""
         print("🔍 测试列出快照...")
         try:
-            response = requests.get(f"{self.base_url}/api/snapshots")
+            response = self.session.get(f"{self.base_url}/api/snapshots")
             if response.status_code == 200:
                 data = response.json()
                 print(f"✅ 快照列表获取成功，共 {data['count']} 个快照")
@@ -91,7 +93,7 @@ class APITester:
         """测试快照信息"""
         print("🔍 测试快照信息...")
         try:
-            response = requests.get(f"{self.base_url}/api/snapshots/info")
+            response = self.session.get(f"{self.base_url}/api/snapshots/info")
             if response.status_code == 200:
                 info = response.json()
                 print(f"✅ 快照信息获取成功")
@@ -109,7 +111,7 @@ class APITester:
         """测试快照清理"""
         print("🔍 测试快照清理...")
         try:
-            response = requests.post(f"{self.base_url}/api/snapshots/cleanup")
+            response = self.session.post(f"{self.base_url}/api/snapshots/cleanup")
             if response.status_code == 200:
                 result = response.json()
                 print(f"✅ 快照清理成功，删除了 {result['count']} 个快照")
@@ -125,7 +127,7 @@ class APITester:
         """测试监控状态"""
         print("🔍 测试监控状态...")
         try:
-            response = requests.get(f"{self.base_url}/api/monitoring")
+            response = self.session.get(f"{self.base_url}/api/monitoring")
             if response.status_code == 200:
                 status = response.json()
                 print(f"✅ 监控状态获取成功")
@@ -143,7 +145,7 @@ class APITester:
         """测试文件列表"""
         print("🔍 测试文件列表...")
         try:
-            response = requests.get(f"{self.base_url}/api/files")
+            response = self.session.get(f"{self.base_url}/api/files")
             if response.status_code == 200:
                 data = response.json()
                 print(f"✅ 文件列表获取成功，共 {data['count']} 个文件")
@@ -161,7 +163,7 @@ class APITester:
         """测试系统统计"""
         print("🔍 测试系统统计...")
         try:
-            response = requests.get(f"{self.base_url}/api/stats")
+            response = self.session.get(f"{self.base_url}/api/stats")
             if response.status_code == 200:
                 stats = response.json()
                 print(f"✅ 系统统计获取成功")
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+import unittest
+import tempfile
+import shutil
+import sys
+import os
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api_server
+from api_server import SnapshotAPI
+
+# Keep test trees on tmpfs when there is one, unless TMPDIR says otherwise
+TEST_TMPDIR = None if os.environ.get('TMPDIR') or not os.access('/dev/shm', os.W_OK) else '/dev/shm'
+
+
+class TestSnapshotFileDownload(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp(prefix="api_test_", dir=TEST_TMPDIR)
+        self.watch_dir = Path(self.test_dir) / "watch"
+        self.snapshot_dir = Path(self.test_dir) / "snapshots"
+        self.watch_dir.mkdir(parents=True)
+
+        self.snapshot = self.snapshot_dir / "snapshot_1"
+        self.snapshot.mkdir(parents=True)
+        (self.snapshot / "data.txt").write_text("snapshot data")
+
+        # Outside the snapshot, but inside snapshot_dir and on the host
+        (self.snapshot_dir / "other.txt").write_text("other")
+        self.secret = Path(self.test_dir) / "secret.txt"
+        self.secret.write_text("secret")
+
+        config_file = Path(self.test_dir) / "config.yaml"
+        config_file.write_text(f"watch_dir: {self.watch_dir}\nsnapshot_dir: {self.snapshot_dir}\ntest_mode: true\n")
+        self.client = SnapshotAPI(str(config_file)).app.test_client()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def download(self, file_path):
+        response = self.client.get(f"/api/snapshots/snapshot_1/files/{file_path}")
+        response.close()
+        return response
+
+    def test_download_file(self):
+        response = self.client.get("/api/snapshots/snapshot_1/files/data.txt")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_data(), b"snapshot data")
+        response.close()
+
+    def test_symlink_inside_snapshot(self):
+        (self.snapshot / "link.txt").symlink_to("data.txt")
+        self.assertEqual(self.download("link.txt").status_code, 200)
+
+    def test_symlink_escaping_snapshot(self):
+        (self.snapshot / "escape.txt").symlink_to(self.secret)
+        (self.snapshot / "sibling.txt").symlink_to(self.snapshot_dir / "other.txt")
+        (self.snapshot / "etc").symlink_to(self.secret.parent)
+
+        self.assertEqual(self.download("escape.txt").status_code, 404)
+        self.assertEqual(self.download("sibling.txt").status_code, 404)
+        self.assertEqual(self.download("etc/secret.txt").status_code, 404)
+
+    def test_dotdot_traversal(self):
+        self.assertEqual(self.download("../other.txt").status_code, 404)
+        self.assertEqual(self.download("%2e%2e/other.txt").status_code, 404)
+        self.assertEqual(self.download("..%2f..%2fsecret.txt").status_code, 404)
+        response = self.client.get("/api/snapshots/..%2f..%2f/files/secret.txt")
+        self.assertEqual(response.status_code, 404)
+
+
+class TestMonitoringStart(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp(prefix="api_test_", dir=TEST_TMPDIR)
+        config_file = Path(self.test_dir) / "config.yaml"
+        config_file.write_text(f"watch_dir: {self.test_dir}/missing\nsnapshot_dir: {self.test_dir}/snapshots\n"
+                               "test_mode: true\n")
+        self.api = SnapshotAPI(str(config_file))
+        self.client = self.api.app.test_client()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_failed_watcher_leaves_no_batcher_running(self):
+        response = self.client.post("/api/monitoring/start")
+
+        self.assertEqual(response.status_code, 500)
+        self.assertFalse(self.api.monitoring_active)
+        self.assertIsNone(self.api.batcher._thread)
+
+
+@unittest.skipIf(api_server.msgpack is None, "msgpack not installed")
+class TestMessagePackNegotiation(unittest.TestCase):
+    MSGPACK = {'Accept': 'application/msgpack'}
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp(prefix="api_test_", dir=TEST_TMPDIR)
+        self.snapshot_dir = Path(self.test_dir) / "snapshots"
+        for i in range(3):
+            (self.snapshot_dir / f"watch_2024010{i + 1}_000000_000").mkdir(parents=True)
+        config_file = Path(self.test_dir) / "config.yaml"
+        config_file.write_text(f"watch_dir: {self.test_dir}\nsnapshot_dir: {self.snapshot_dir}\ntest_mode: true\n")
+        self.api = SnapshotAPI(str(config_file))
+        self.client = self.api.app.test_client()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_etag_depends_on_representation(self):
+        as_json = self.client.get("/api/config")
+        as_msgpack = self.client.get("/api/config", headers=self.MSGPACK)
+        self.assertEqual(as_msgpack.mimetype, 'application/msgpack')
+        self.assertNotEqual(as_json.headers['ETag'], as_msgpack.headers['ETag'])
+
+        # A cached JSON body must not be confirmed to a MessagePack client
+        response = self.client.get("/api/config", headers={**self.MSGPACK, 'If-None-Match': as_json.headers['ETag']})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/msgpack')
+
+        response = self.client.get("/api/config", headers={**self.MSGPACK, 'If-None-Match': as_msgpack.headers['ETag']})
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get("/api/config", headers={'If-None-Match': as_json.headers['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    def test_streamed_list_stays_json(self):
+        self.api.STREAM_THRESHOLD = 2
+
+        response = self.client.get("/api/snapshots", headers=self.MSGPACK)
+        self.assertEqual(response.mimetype, 'application/json')
+        self.assertEqual(response.get_json()['count'], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,83 +1,130 @@
 #!/usr/bin/env python3
 """Test file monitoring in real-time"""
 
+import sys
 import time
+import select
+import shutil
 import tempfile
+import unittest
 import subprocess
 import os
 from pathlib import Path
 
-# Create test directories
-test_dir = tempfile.mkdtemp(prefix="monitor_test_")
-watch_dir = Path(test_dir) / "watch"
-snapshot_dir = Path(test_dir) / "snapshots"
-watch_dir.mkdir(parents=True)
-snapshot_dir.mkdir(parents=True)
-
-print(f"Test directories created:")
-print(f"  Watch dir: {watch_dir}")
-print(f"  Snapshot dir: {snapshot_dir}")
-
-# Create temp config file
-config_file = Path(test_dir) / "test_config.yaml"
-config_content = f"""
-watch_dir: {watch_dir}
-snapshot_dir: {snapshot_dir}
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# Create test directories on tmpfs when there is one, unless TMPDIR says otherwise
+TEST_TMPDIR = None if os.environ.get('TMPDIR') or not os.access('/dev/shm', os.W_OK) else '/dev/shm'
+
+
+def wait_for_exit(process, timeout):
+    """Block on a pidfd (Linux) or kqueue (BSD/macOS) until the process exits,
+    instead of Popen.wait's sleep-and-poll loop"""
+    waited = True
+    try:
+        if hasattr(os, 'pidfd_open'):
+            fd = os.pidfd_open(process.pid)
+            try:
+                poller = select.poll()
+                poller.register(fd, select.POLLIN)
+                poller.poll(timeout * 1000)
+            finally:
+                os.close(fd)
+        elif hasattr(select, 'kqueue'):
+            kq = select.kqueue()
+            try:
+                event = select.kevent(process.pid, filter=select.KQ_FILTER_PROC,
+                                      flags=select.KQ_EV_ADD | select.KQ_EV_ONESHOT,
+                                      fflags=select.KQ_NOTE_EXIT)
+                kq.control([event], 1, timeout)
+            finally:
+                kq.close()
+        else:
+            waited = False
+    except ProcessLookupError:
+        pass  # already exited and reaped, e.g. by terminate()'s poll()
+
+    # Reaps the already-exited child; TimeoutExpired as before if it is still running
+    return process.wait(timeout=0 if waited else timeout)
+
+
+class TestFileMonitor(unittest.TestCase):
+    """One monitor process serves the whole class. The numbered phases run in
+    name order and each builds on the snapshots of the one before."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.test_dir = tempfile.mkdtemp(prefix="monitor_test_", dir=TEST_TMPDIR)
+        cls.watch_dir = Path(cls.test_dir) / "watch"
+        cls.snapshot_dir = Path(cls.test_dir) / "snapshots"
+        cls.watch_dir.mkdir(parents=True)
+        cls.snapshot_dir.mkdir(parents=True)
+
+        # Create temp config file
+        config_file = Path(cls.test_dir) / "test_config.yaml"
+        config_file.write_text(f"""
+watch_dir: {cls.watch_dir}
+snapshot_dir: {cls.snapshot_dir}
 max_snapshots: 5
 cleanup_mode: count
 cooldown_seconds: 5
 debounce_seconds: 3
-log_file: {test_dir}/test.log
+log_file: {cls.test_dir}/test.log
 log_level: DEBUG
-"""
-config_file.write_text(config_content)
-
-# Start the monitor in background
-cmd = [
-    "python3", "btrfs_snapshot_manager.py",
-    "--test-mode",
-    "-c", str(config_file),
-    "--log-level", "INFO"
-]
-
-print("\nStarting monitor process...")
-process = subprocess.Popen(cmd, env={**os.environ, 'PYTHONPATH': '.'})
-
-try:
-    # Give it time to start
-    time.sleep(2)
-
-    # Create some files
-    print("\n1. Creating test1.txt...")
-    (watch_dir / "test1.txt").write_text("Initial content")
-    time.sleep(6)  # Wait for debounce
-
-    print("2. Modifying test1.txt...")
-    (watch_dir / "test1.txt").write_text("Modified content")
-    time.sleep(6)
-
-    print("3. Creating multiple files quickly...")
-    for i in range(3):
-        (watch_dir / f"batch_{i}.txt").write_text(f"Content {i}")
-    time.sleep(6)
-
-    print("4. Creating a temp file (should be ignored)...")
-    (watch_dir / "test.tmp").write_text("Temp content")
-    time.sleep(6)
-
-    # Check snapshots
-    print("\nChecking snapshots created:")
-    snapshots = list(snapshot_dir.iterdir())
-    print(f"Found {len(snapshots)} snapshots:")
-    for snap in sorted(snapshots):
-        print(f"  - {snap.name}")
-
-finally:
-    print("\nStopping monitor process...")
-    process.terminate()
-    process.wait(timeout=5)
-
-    # Cleanup
-    import shutil
-    shutil.rmtree(test_dir, ignore_errors=True)
-    print("Test completed and cleaned up")
\ No newline at end of file
+""")
+
+        # Start the monitor in background
+        cmd = [
+            sys.executable, "btrfs_snapshot_manager.py",
+            "--test-mode",
+            "-c", str(config_file),
+            "--log-level", "INFO"
+        ]
+        cls.process = subprocess.Popen(cmd, cwd=PROJECT_ROOT,
+                                       env={**os.environ, 'PYTHONPATH': str(PROJECT_ROOT)})
+
+        # Give it time to start, once for all phases
+        time.sleep(2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.process.terminate()
+        wait_for_exit(cls.process, timeout=5)
+        shutil.rmtree(cls.test_dir, ignore_errors=True)
+
+    def snapshot_count(self) -> int:
+        with os.scandir(self.snapshot_dir) as it:
+            return sum(1 for _ in it)
+
+    def wait_for_snapshots(self, target_count, timeout=10):
+        """Return as soon as snapshot_dir holds target_count snapshots, False on timeout"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.snapshot_count() >= target_count:
+                return True
+            time.sleep(0.1)
+        return False
+
+    def test_1_create_file(self):
+        (self.watch_dir / "test1.txt").write_text("Initial content")
+        self.assertTrue(self.wait_for_snapshots(1))  # Debounce, then the snapshot
+
+    def test_2_modify_file(self):
+        (self.watch_dir / "test1.txt").write_text("Modified content")
+        self.assertTrue(self.wait_for_snapshots(2))  # Also waits out the cooldown
+
+    def test_3_create_batch(self):
+        for i in range(3):
+            (self.watch_dir / f"batch_{i}.txt").write_text(f"Content {i}")
+        self.assertTrue(self.wait_for_snapshots(3))
+        self.assertEqual(self.snapshot_count(), 3)
+
+    def test_4_temp_file_ignored(self):
+        (self.watch_dir / "test.tmp").write_text("Temp content")
+        # Nothing should appear, so this one has to wait out debounce and cooldown
+        time.sleep(6)
+        self.assertEqual(self.snapshot_count(), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,21 +4,29 @@ import unittest
 import tempfile
 import shutil
 import time
+import errno
+import subprocess
+import threading
 from pathlib import Path
 from datetime import datetime, timedelta
 import sys
 import os
+from unittest import mock
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from snapshot_manager import SnapshotManager
+from snapshot_manager import SnapshotManager, SnapshotBatcher
 from config_loader import ConfigLoader
 from fs_watcher import FileSystemWatcher
+from btrfs_snapshot_manager import BtrfsSnapshotService
+
+# Keep test trees on tmpfs when there is one, unless TMPDIR says otherwise
+TEST_TMPDIR = None if os.environ.get('TMPDIR') or not os.access('/dev/shm', os.W_OK) else '/dev/shm'
 
 
 class TestSnapshotManager(unittest.TestCase):
     def setUp(self):
-        self.test_dir = tempfile.mkdtemp(prefix="btrfs_test_")
+        self.test_dir = tempfile.mkdtemp(prefix="btrfs_test_", dir=TEST_TMPDIR)
         self.watch_dir = Path(self.test_dir) / "watch"
         self.snapshot_dir = Path(self.test_dir) / "snapshots"
 
@@ -37,6 +45,13 @@ class TestSnapshotManager(unittest.TestCase):
     def tearDown(self):
         shutil.rmtree(self.test_dir, ignore_errors=True)
 
+    def create_snapshots(self, count):
+        # Snapshots are ordered by the millisecond timestamp in their names;
+        # a 2 ms pause is enough to keep those distinct
+        for i in range(count):
+            self.manager.create_snapshot(f"event {i}")
+            time.sleep(0.002)
+
     def test_create_snapshot(self):
         success = self.manager.create_snapshot("test event")
         self.assertTrue(success)
@@ -44,6 +59,40 @@ class TestSnapshotManager(unittest.TestCase):
         snapshots = self.manager.list_snapshots()
         self.assertEqual(len(snapshots), 1)
 
+    def test_list_snapshot_entries(self):
+        self.manager.cooldown_seconds = 0
+
+        self.create_snapshots(3)
+
+        entries = self.manager.list_snapshot_entries()
+        snapshots = self.manager.list_snapshots()
+
+        self.assertEqual([entry.path for entry in entries], [str(s) for s in snapshots])
+
+    def test_list_snapshots_sees_external_changes(self):
+        self.manager.create_snapshot("event")
+        self.assertEqual(len(self.manager.list_snapshots()), 1)
+
+        external = self.snapshot_dir / "external_snapshot"
+        external.mkdir()
+        self.assertIn(external, self.manager.list_snapshots())
+
+        external.rmdir()
+        self.assertNotIn(external, self.manager.list_snapshots())
+
+    def test_list_snapshots_with_stat(self):
+        self.manager.cooldown_seconds = 0
+
+        self.create_snapshots(2)
+
+        snapshots = self.manager.list_snapshots()
+        with_stat = self.manager.list_snapshots_with_stat()
+
+        self.assertEqual([path for _, path, _, _ in with_stat], [str(s) for s in snapshots])
+        name, _, mtime, _ = with_stat[0]
+        self.assertEqual(name, snapshots[0].name)
+        self.assertEqual(mtime, snapshots[0].stat().st_mtime)
+
     def test_cooldown_period(self):
         success1 = self.manager.create_snapshot("event 1")
         self.assertTrue(success1)
@@ -59,32 +108,53 @@ class TestSnapshotManager(unittest.TestCase):
         snapshots = self.manager.list_snapshots()
         self.assertEqual(len(snapshots), 2)
 
+    def test_low_disk_space_result_is_reused(self):
+        self.assertFalse(self.manager._check_disk_space(min_free_gb=float('inf')))
+
+        # Within the hold-off the failed check is reused without a new statvfs
+        self.assertFalse(self.manager._check_disk_space(min_free_gb=0))
+        self.assertIsNone(self.manager.create_snapshot("event"))
+
+        self.manager._low_space_until = 0.0
+        self.assertTrue(self.manager._check_disk_space(min_free_gb=0))
+
     def test_cleanup_by_count(self):
         self.manager.cooldown_seconds = 0
 
-        for i in range(5):
-            self.manager.create_snapshot(f"event {i}")
-            time.sleep(0.1)
+        self.create_snapshots(5)
 
         self.manager.cleanup_old_snapshots()
 
         snapshots = self.manager.list_snapshots()
         self.assertEqual(len(snapshots), 3)
 
+    def test_cleanup_limit(self):
+        self.manager.cooldown_seconds = 0
+
+        self.create_snapshots(6)
+
+        oldest = self.manager.list_snapshots()[0]
+        deleted = self.manager.cleanup_old_snapshots(limit=1)
+
+        self.assertEqual(deleted, [str(oldest)])
+        self.assertEqual(len(self.manager.list_snapshots()), 5)
+
     def test_cleanup_by_time(self):
         self.manager.cleanup_mode = 'time'
         self.manager.retention_days = 1  # Keep snapshots for 1 day
         self.manager.cooldown_seconds = 0
 
-        for i in range(3):
-            self.manager.create_snapshot(f"event {i}")
-            time.sleep(0.1)
+        self.manager.create_snapshot("event")
 
-        snapshots = self.manager.list_snapshots()
-        # Make first 2 snapshots older than retention period
-        for snapshot in snapshots[:2]:
-            old_time = time.time() - (2 * 86400)  # 2 days old
-            os.utime(snapshot, (old_time, old_time))
+        # Age comes from the timestamp in the snapshot name
+        old_timestamp = (datetime.now() - timedelta(days=2)).strftime("%Y%m%d_%H%M%S_%f")[:-3]
+        (self.snapshot_dir / f"{self.manager.snapshot_prefix}_{old_timestamp}").mkdir()
+
+        # and from mtime for names without one
+        legacy = self.snapshot_dir / "legacy_snapshot"
+        legacy.mkdir()
+        old_time = time.time() - (2 * 86400)  # 2 days old
+        os.utime(legacy, (old_time, old_time))
 
         deleted = self.manager.cleanup_old_snapshots()
 
@@ -96,9 +166,7 @@ class TestSnapshotManager(unittest.TestCase):
     def test_snapshot_info(self):
         self.manager.cooldown_seconds = 0
 
-        for i in range(2):
-            self.manager.create_snapshot(f"event {i}")
-            time.sleep(0.1)
+        self.create_snapshots(2)
 
         info = self.manager.get_snapshot_info()
 
@@ -108,9 +176,360 @@ class TestSnapshotManager(unittest.TestCase):
         self.assertIsNotNone(info['last_snapshot_time'])
 
 
+class FakeBtrfsTestCase(unittest.TestCase):
+    # A stand-in btrfs first on PATH. Every call is logged; "subvolume delete"
+    # removes its paths but fails on ones containing "busy", and any other
+    # subcommand prints the output set with btrfs_output or fails if there is none
+    FAKE_BTRFS = """#!/bin/sh
+echo "$@" >> "$BTRFS_CALL_LOG"
+if [ "$1 $2" = "subvolume delete" ]; then
+    shift 2
+    status=0
+    for path in "$@"; do
+        case "$path" in
+            *busy*) status=1 ;;
+            *) rm -rf "$path" ;;
+        esac
+    done
+    exit $status
+fi
+output="$BTRFS_OUTPUT_DIR/$1_$2"
+if [ ! -f "$output" ]; then
+    echo "ERROR: $1 $2 not available" >&2
+    exit 1
+fi
+cat "$output"
+"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp(prefix="fake_btrfs_test_", dir=TEST_TMPDIR)
+        self.watch_dir = Path(self.test_dir) / "watch"
+        self.snapshot_dir = Path(self.test_dir) / "snapshots"
+        self.bin_dir = Path(self.test_dir) / "bin"
+        self.output_dir = Path(self.test_dir) / "output"
+        self.call_log = Path(self.test_dir) / "btrfs_calls.log"
+        self.watch_dir.mkdir(parents=True)
+        self.snapshot_dir.mkdir(parents=True)
+        self.bin_dir.mkdir()
+        self.output_dir.mkdir()
+        self.call_log.touch()
+
+        fake_btrfs = self.bin_dir / "btrfs"
+        fake_btrfs.write_text(self.FAKE_BTRFS)
+        fake_btrfs.chmod(0o755)
+
+        self._saved_env = {key: os.environ.get(key) for key in ('PATH', 'BTRFS_CALL_LOG', 'BTRFS_OUTPUT_DIR')}
+        os.environ['PATH'] = f"{self.bin_dir}{os.pathsep}{os.environ.get('PATH', '')}"
+        os.environ['BTRFS_CALL_LOG'] = str(self.call_log)
+        os.environ['BTRFS_OUTPUT_DIR'] = str(self.output_dir)
+
+        self.manager = SnapshotManager(
+            watch_dir=str(self.watch_dir),
+            snapshot_dir=str(self.snapshot_dir),
+            max_snapshots=1,
+            cleanup_mode='count',
+            cooldown_seconds=0,
+            use_ioctl=False
+        )
+
+    def tearDown(self):
+        for key, value in self._saved_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def make_snapshot(self, name, age_seconds=0):
+        snapshot = self.snapshot_dir / name
+        snapshot.mkdir()
+        mtime = time.time() - age_seconds
+        os.utime(snapshot, (mtime, mtime))
+        return str(snapshot)
+
+    def btrfs_output(self, subcommand, text):
+        (self.output_dir / subcommand.replace(' ', '_')).write_text(text)
+
+    def btrfs_calls(self, subcommand=''):
+        calls = [line.split() for line in self.call_log.read_text().splitlines()]
+        return [call[2:] for call in calls if ' '.join(call).startswith(subcommand)]
+
+
+class TestSnapshotCliDelete(FakeBtrfsTestCase):
+    def test_cleanup_deletes_in_one_call(self):
+        old = [self.make_snapshot(f"old_{i}", 300 - i) for i in range(3)]
+        newest = self.make_snapshot("newest", 0)
+
+        deleted = self.manager.cleanup_old_snapshots()
+
+        self.assertEqual(deleted, old)
+        self.assertEqual(self.btrfs_calls('subvolume delete'), [old])
+        self.assertEqual([str(s) for s in self.manager.list_snapshots()], [newest])
+
+    def test_failed_batch_retries_remaining_individually(self):
+        busy = self.make_snapshot("busy_snapshot", 300)
+        old = [self.make_snapshot(f"old_{i}", 200 - i) for i in range(2)]
+        newest = self.make_snapshot("newest", 0)
+
+        deleted = self.manager.cleanup_old_snapshots()
+
+        # The batch removed the others before failing; only the busy one is retried
+        self.assertEqual(deleted, old)
+        self.assertEqual(self.btrfs_calls('subvolume delete'), [[busy, *old], [busy]])
+        self.assertEqual([str(s) for s in self.manager.list_snapshots()], [busy, newest])
+
+
+class TestSnapshotSizes(FakeBtrfsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.snapshots = [Path(self.make_snapshot(name)) for name in ("s1", "s2", "s3", "s4")]
+
+    def test_sizes_from_qgroups(self):
+        self.btrfs_output('subvolume list', "\n".join([
+            "ID 257 gen 12 top level 5 path snapshots/s1",
+            "ID 258 gen 13 top level 5 path snapshots/s2",
+            "ID 259 gen 14 top level 5 path snapshots/s3",
+            "ID 260 gen 15 top level 5",
+            "not a subvolume line",
+            "",
+        ]))
+        self.btrfs_output('qgroup show', "\n".join([
+            "qgroupid         rfer         excl",
+            "--------         ----         ----",
+            "0/5             16384        16384",
+            "0/257            1000          100",
+            "0/258            2000          200",
+            "0/259             n/a          n/a",
+            "0/257",
+            "",
+        ]))
+
+        # s3's size is unparseable and s4 has no qgroup: both count as 0
+        self.assertEqual(self.manager._qgroup_sizes(), {"s1": 1000, "s2": 2000})
+        self.assertEqual(self.manager.get_snapshot_info(self.snapshots)['total_size'], 3000)
+        self.assertEqual(self.btrfs_calls('filesystem du'), [])
+
+    def test_quota_not_enabled_falls_back_to_du(self):
+        self.btrfs_output('subvolume list', "ID 257 gen 12 top level 5 path snapshots/s1\n")
+        self.btrfs_output('filesystem du', "\n".join([
+            "     Total   Exclusive  Set shared  Filename",
+            f"      1000         100           -  {self.snapshots[0]}",
+            "ERROR: cannot check space of 's2': Operation not permitted",
+            f"      2000         200           -  {self.snapshots[2]}",
+            "",
+            f"       n/a           -           -  {self.snapshots[3]}",
+            "",
+        ]))
+
+        self.assertIsNone(self.manager._qgroup_sizes())
+        self.assertEqual(self.manager.get_snapshot_info(self.snapshots)['total_size'], 3000)
+
+        # Quotas are not asked about again once they turned out to be off
+        self.assertEqual(self.manager.get_snapshot_info(self.snapshots)['total_size'], 3000)
+        self.assertEqual(len(self.btrfs_calls('qgroup show')), 1)
+        self.assertEqual(self.btrfs_calls('filesystem du'),
+                         [['-s', '--raw', *map(str, self.snapshots)]] * 2)
+
+
+class TestSnapshotIoctl(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp(prefix="ioctl_test_", dir=TEST_TMPDIR)
+        self.watch_dir = Path(self.test_dir) / "watch"
+        self.snapshot_dir = Path(self.test_dir) / "snapshots"
+        self.watch_dir.mkdir(parents=True)
+
+        self.manager = SnapshotManager(
+            watch_dir=str(self.watch_dir),
+            snapshot_dir=str(self.snapshot_dir),
+            cooldown_seconds=0
+        )
+        self.manager._check_disk_space = lambda: True
+
+        patchers = [
+            mock.patch('btrfs_ioctl.fcntl.ioctl'),
+            mock.patch('snapshot_manager.subprocess.run',
+                       return_value=subprocess.CompletedProcess([], 0, '', '')),
+        ]
+        self.ioctl, self.run = [patcher.start() for patcher in patchers]
+        for patcher in patchers:
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def fail_ioctl(self, code):
+        self.ioctl.side_effect = OSError(code, os.strerror(code))
+
+    def test_success_spawns_no_process(self):
+        snapshot = self.manager.create_snapshot("event")
+        self.assertIsNotNone(snapshot)
+        self.assertTrue(self.manager._delete_snapshot(snapshot))
+
+        self.assertEqual(self.ioctl.call_count, 2)
+        self.run.assert_not_called()
+        self.assertTrue(self.manager.use_ioctl)
+
+    def test_unsupported_ioctl_switches_to_command(self):
+        for code in (errno.ENOTTY, errno.EINVAL):
+            with self.subTest(errno=errno.errorcode[code]):
+                self.manager.use_ioctl = True
+                self.ioctl.reset_mock()
+                self.run.reset_mock()
+                self.fail_ioctl(code)
+
+                self.assertIsNotNone(self.manager.create_snapshot("event"))
+                self.assertFalse(self.manager.use_ioctl)
+                self.assertEqual(self.run.call_args[0][0][:3], ['btrfs', 'subvolume', 'snapshot'])
+
+                # Later operations go straight to the command
+                self.assertTrue(self.manager._delete_snapshot(self.snapshot_dir / "old"))
+                self.assertEqual(self.ioctl.call_count, 1)
+                self.assertEqual(self.run.call_count, 2)
+
+    def test_other_errors_fall_back_to_command(self):
+        self.fail_ioctl(errno.EIO)
+
+        self.assertTrue(self.manager._delete_snapshot(self.snapshot_dir / "old"))
+        self.run.assert_called_once()
+        self.assertEqual(self.run.call_args[0][0],
+                         ['btrfs', 'subvolume', 'delete', str(self.snapshot_dir / "old")])
+        self.assertTrue(self.manager.use_ioctl)
+
+    def test_errors_the_command_shares_are_not_retried(self):
+        for code in (errno.EEXIST, errno.EPERM, errno.ENOENT):
+            with self.subTest(errno=errno.errorcode[code]):
+                self.fail_ioctl(code)
+
+                with self.assertLogs('snapshot_manager', level='ERROR') as logs:
+                    self.assertIsNone(self.manager.create_snapshot("event"))
+                    self.assertFalse(self.manager._delete_snapshot(self.snapshot_dir / "old"))
+
+                self.assertEqual(len(logs.records), 2)
+                self.run.assert_not_called()
+                self.assertTrue(self.manager.use_ioctl)
+
+
+class FakeCleanupManager:
+    # Records the limit of each cleanup and deletes up to that many of backlog
+    def __init__(self, backlog):
+        self.backlog = backlog
+        self.limits = []
+
+    def cleanup_old_snapshots(self, limit=None):
+        self.limits.append(limit)
+        count = min(limit, self.backlog)
+        self.backlog -= count
+        return [f"snapshot_{i}" for i in range(count)]
+
+
+class TestSnapshotBatcher(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp(prefix="batcher_test_", dir=TEST_TMPDIR)
+        self.watch_dir = Path(self.test_dir) / "watch"
+        self.snapshot_dir = Path(self.test_dir) / "snapshots"
+        self.watch_dir.mkdir(parents=True)
+
+        self.manager = SnapshotManager(
+            watch_dir=str(self.watch_dir),
+            snapshot_dir=str(self.snapshot_dir),
+            max_snapshots=3,
+            cooldown_seconds=0,
+            test_mode=True
+        )
+        self.batcher = SnapshotBatcher(self.manager)
+
+    def tearDown(self):
+        self.batcher.stop()
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_pending_requests_coalesced(self):
+        for i in range(5):
+            self.batcher.submit(f"modified: file{i}.txt")
+
+        self.batcher.start()
+
+        deadline = time.time() + 5
+        while not self.manager.list_snapshots() and time.time() < deadline:
+            time.sleep(0.05)
+        time.sleep(0.2)
+
+        self.assertEqual(len(self.manager.list_snapshots()), 1)
+
+    def test_requests_during_cooldown_deferred(self):
+        self.manager.cooldown_seconds = 1
+        self.batcher.start()
+
+        self.batcher.submit("modified: first.txt")
+        deadline = time.time() + 5
+        while not self.manager.list_snapshots() and time.time() < deadline:
+            time.sleep(0.05)
+
+        self.batcher.submit("modified: second.txt")
+        deadline = time.time() + 5
+        while len(self.manager.list_snapshots()) < 2 and time.time() < deadline:
+            time.sleep(0.05)
+
+        self.assertEqual(len(self.manager.list_snapshots()), 2)
+
+    def test_cleanup_rate_limit(self):
+        # rate 2/min: at most 2 in a burst, then one more every 30 s
+        limiter = SnapshotBatcher(FakeCleanupManager(backlog=10), cleanup_rate_per_min=2)
+        with mock.patch('snapshot_manager.time.monotonic') as clock:
+            clock.return_value = limiter._cleanup_refilled
+            limiter._cleanup()
+            limiter._cleanup()
+            self.assertEqual(limiter.manager.limits, [2])
+
+            clock.return_value += 15
+            limiter._cleanup()
+            self.assertEqual(limiter.manager.limits, [2])
+
+            clock.return_value += 15
+            limiter._cleanup()
+            self.assertEqual(limiter.manager.limits, [2, 1])
+
+            # An idle hour refills to the cap, not to 120 tokens
+            clock.return_value += 3600
+            limiter._cleanup()
+            self.assertEqual(limiter.manager.limits, [2, 1, 2])
+            self.assertEqual(limiter.manager.backlog, 5)
+
+    def test_cleanup_rate_below_one_per_minute(self):
+        limiter = SnapshotBatcher(FakeCleanupManager(backlog=10), cleanup_rate_per_min=0.5)
+        with mock.patch('snapshot_manager.time.monotonic') as clock:
+            clock.return_value = limiter._cleanup_refilled
+            limiter._cleanup()
+            self.assertEqual(limiter.manager.limits, [1])
+
+            clock.return_value += 60
+            limiter._cleanup()
+            self.assertEqual(limiter.manager.limits, [1])
+
+            clock.return_value += 60
+            limiter._cleanup()
+            self.assertEqual(limiter.manager.limits, [1, 1])
+
+    def test_unused_tokens_kept_when_nothing_to_delete(self):
+        limiter = SnapshotBatcher(FakeCleanupManager(backlog=0), cleanup_rate_per_min=2)
+        with mock.patch('snapshot_manager.time.monotonic') as clock:
+            clock.return_value = limiter._cleanup_refilled
+            limiter._cleanup()
+
+            limiter.manager.backlog = 10
+            limiter._cleanup()
+            self.assertEqual(limiter.manager.limits, [2, 2])
+
+    def test_pending_requests_bounded(self):
+        for i in range(SnapshotBatcher.MAX_PENDING + 10):
+            self.batcher.submit(f"modified: file{i}.txt")
+
+        self.assertEqual(len(self.batcher._pending), SnapshotBatcher.MAX_PENDING)
+        self.assertEqual(self.batcher._dropped, 10)
+
+
 class TestConfigLoader(unittest.TestCase):
     def setUp(self):
-        self.temp_dir = tempfile.mkdtemp(prefix="config_test_")
+        self.temp_dir = tempfile.mkdtemp(prefix="config_test_", dir=TEST_TMPDIR)
         self.config_file = Path(self.temp_dir) / "test_config.yaml"
 
     def tearDown(self):
@@ -136,7 +555,7 @@ class TestConfigLoader(unittest.TestCase):
         }
 
         with open(self.config_file, 'w') as f:
-            yaml.dump(test_config, f)
+            yaml.dump(test_config, f, Dumper=getattr(yaml, 'CSafeDumper', yaml.SafeDumper))
 
         loader = ConfigLoader(str(self.config_file))
         config = loader.load()
@@ -156,13 +575,84 @@ class TestConfigLoader(unittest.TestCase):
         del os.environ['BTRFS_MAX_SNAPSHOTS']
 
 
+class TestMountFstype(unittest.TestCase):
+    # Mount points as the kernel escapes them: \040 space, \011 tab, \134 backslash
+    MOUNTINFO = "\n".join([
+        r"22 1 8:1 / / rw,relatime shared:1 - ext4 /dev/sda1 rw",
+        r"30 22 8:2 / /data rw,relatime shared:2 - xfs /dev/sda2 rw",
+        r"31 30 0:40 /@vol /data/my\040vol rw,relatime shared:3 - btrfs /dev/sdb rw,subvol=/@vol",
+        r"32 31 0:41 / /data/my\040vol/tab\011dir rw shared:4 - tmpfs tmpfs rw",
+        r"33 30 0:42 / /data/my\040volume rw shared:5 - nfs server:/export rw",
+        r"34 30 0:43 / /data/back\134slash rw shared:6 - vfat /dev/sdc1 rw",
+        "",
+    ])
+
+    def fstype(self, path):
+        with mock.patch('btrfs_snapshot_manager.open', mock.mock_open(read_data=self.MOUNTINFO), create=True):
+            return BtrfsSnapshotService._mount_fstype(Path(path))
+
+    def test_longest_matching_mount_point_wins(self):
+        self.assertEqual(self.fstype("/data/my vol/file"), "btrfs")
+        self.assertEqual(self.fstype("/data/my vol"), "btrfs")
+        self.assertEqual(self.fstype("/data/my vol/tab\tdir/file"), "tmpfs")
+        self.assertEqual(self.fstype("/data/my volume/file"), "nfs")
+        self.assertEqual(self.fstype("/data/back\\slash/file"), "vfat")
+        self.assertEqual(self.fstype("/data"), "xfs")
+        self.assertEqual(self.fstype("/elsewhere"), "ext4")
+
+    def test_prefix_must_end_at_a_path_component(self):
+        self.assertEqual(self.fstype("/data/my vol2/file"), "xfs")
+        self.assertEqual(self.fstype("/database"), "ext4")
+
+    def test_no_mountinfo(self):
+        with mock.patch('btrfs_snapshot_manager.open', side_effect=OSError, create=True):
+            self.assertIsNone(BtrfsSnapshotService._mount_fstype(Path("/data")))
+
+
+class TestValidateEnvironment(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp(prefix="validate_test_", dir=TEST_TMPDIR)
+        self.watch_dir = Path(self.test_dir) / "watch"
+        self.watch_dir.mkdir()
+        config_file = Path(self.test_dir) / "config.yaml"
+        config_file.write_text(f"watch_dir: {self.watch_dir}\nsnapshot_dir: {self.test_dir}/snapshots\n")
+        self.service = BtrfsSnapshotService(str(config_file), test_mode=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_unreadable_watch_dir(self):
+        with mock.patch('btrfs_snapshot_manager.os.stat', side_effect=PermissionError(13, "Permission denied")):
+            with self.assertLogs('btrfs_snapshot_manager', level='ERROR'), self.assertRaises(SystemExit):
+                self.service.validate_environment()
+
+    def test_snapshot_dir_cannot_be_created(self):
+        blocker = Path(self.test_dir) / "not_a_dir"
+        blocker.write_text("")
+        self.service.config['snapshot_dir'] = str(blocker / "snapshots")
+
+        with self.assertLogs('btrfs_snapshot_manager', level='ERROR'), self.assertRaises(SystemExit):
+            self.service.validate_environment()
+
+    def test_btrfs_command_not_runnable(self):
+        with mock.patch.object(BtrfsSnapshotService, '_mount_fstype', return_value=None), \
+                mock.patch('btrfs_snapshot_manager.subprocess.run', side_effect=PermissionError(13, "Permission denied")):
+            with self.assertLogs('btrfs_snapshot_manager', level='ERROR'):
+                self.assertFalse(self.service.is_btrfs_subvolume(self.watch_dir))
+
+
 class TestFileSystemWatcher(unittest.TestCase):
     def setUp(self):
-        self.test_dir = tempfile.mkdtemp(prefix="watcher_test_")
+        self.test_dir = tempfile.mkdtemp(prefix="watcher_test_", dir=TEST_TMPDIR)
         self.events_received = []
+        # Set once _target callbacks have arrived, so tests don't sleep out the debounce
+        self._done = threading.Event()
+        self._target = None
 
         def callback(event_type, file_path):
             self.events_received.append((event_type, file_path))
+            if self._target and len(self.events_received) >= self._target:
+                self._done.set()
 
         self.watcher = FileSystemWatcher(
             watch_dir=self.test_dir,
@@ -174,17 +664,25 @@ class TestFileSystemWatcher(unittest.TestCase):
         self.watcher.stop()
         shutil.rmtree(self.test_dir, ignore_errors=True)
 
+    def assert_no_more_callbacks(self):
+        # A further callback would arrive within one more debounce period
+        self._target = len(self.events_received) + 1
+        self._done.clear()
+        self.assertFalse(self._done.wait(self.watcher.debounce_seconds + 0.5))
+
     def test_file_creation_detection(self):
+        self._target = 1
         self.watcher.start()
 
         test_file = Path(self.test_dir) / "test.txt"
         test_file.write_text("test content")
 
-        time.sleep(2)
+        self._done.wait(2.0)
 
         self.assertTrue(len(self.events_received) > 0)
 
     def test_debouncing(self):
+        self._target = 1
         self.watcher.start()
 
         for i in range(5):
@@ -192,11 +690,13 @@ class TestFileSystemWatcher(unittest.TestCase):
             test_file.write_text(f"content {i}")
             time.sleep(0.1)
 
-        time.sleep(2)
+        self.assertTrue(self._done.wait(2.0))
+        self.assert_no_more_callbacks()
 
         self.assertEqual(len(self.events_received), 1)
 
     def test_ignore_patterns(self):
+        self._target = 1
         self.watcher.start()
 
         tmp_file = Path(self.test_dir) / "test.tmp"
@@ -205,9 +705,45 @@ class TestFileSystemWatcher(unittest.TestCase):
         real_file = Path(self.test_dir) / "real.txt"
         real_file.write_text("real content")
 
-        time.sleep(2)
+        self.assertTrue(self._done.wait(2.0))
+        self.assert_no_more_callbacks()
 
         self.assertEqual(len(self.events_received), 1)
+        self.assertEqual(self.events_received[0][1], "real.txt")
+
+    def test_reads_are_not_changes(self):
+        test_file = Path(self.test_dir) / "test.txt"
+        test_file.write_text("test content")
+
+        self._target = 1
+        self.watcher.start()
+
+        test_file.read_text()
+
+        self.assertFalse(self._done.wait(1.5))
+
+    def test_on_event_listener(self):
+        tmp_file = Path(self.test_dir) / "test.tmp"
+        raw_events = []
+
+        def on_event(path):
+            raw_events.append(path)
+            if path == str(tmp_file):
+                self._done.set()
+
+        self.watcher = FileSystemWatcher(
+            watch_dir=self.test_dir,
+            callback=lambda event_type, file_path: None,
+            debounce_seconds=1,
+            on_event=on_event
+        )
+        self.watcher.start()
+
+        tmp_file.write_text("temp content")
+
+        # Raw events arrive before debouncing, even for ignored files
+        self.assertTrue(self._done.wait(2.0))
+        self.assertIn(str(tmp_file), raw_events)
 
 
 if __name__ == '__main__':
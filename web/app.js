@@ -99,21 +99,29 @@ class BtrfsManager {
     // 更新系统状态
     async updateStatus() {
         try {
+            // 一次批量请求获取所有状态数据
+            const batch = await this.apiRequest('/batch', {
+                method: 'POST',
+                body: JSON.stringify(['/api/health', '/api/snapshots/bundle', '/api/stats'])
+            });
+
             // 健康检查
-            const health = await this.apiRequest('/health');
+            const health = batch['/api/health'];
             this.updateStatusIndicator(health.status === 'healthy');
 
+            // 快照列表、统计和监控状态
+            const bundle = batch['/api/snapshots/bundle'];
+
             // 监控状态
-            const monitoring = await this.apiRequest('/monitoring');
+            const monitoring = bundle.monitoring;
             this.updateMonitoringStatus(monitoring.active);
             this.updateMonitoringPath(monitoring.watch_dir);
 
             // 快照统计
-            const snapshots = await this.apiRequest('/snapshots');
-            this.updateSnapshotCount(snapshots.count);
+            this.updateSnapshotCount(bundle.count);
 
             // 系统统计
-            const stats = await this.apiRequest('/stats');
+            const stats = batch['/api/stats'];
             this.updateSystemStats(stats);
 
         } catch (error) {